@@ -1,16 +1,19 @@
 #TODO: use agent storage to store the last time the email was sent
 from uagents import Agent, Context, Model
+from typing import Optional
 import dotenv
 import os
-from canvasapi import Canvas
 from datetime import datetime, timedelta, timezone
 from datetime import datetime, timedelta, timezone
-from canvasapi import Canvas
 import os 
 import dotenv
 import pytz 
 from uagents.setup import fund_agent_if_low
 from local_cache import NotificationCache
+from canvas_fetcher import CanvasFetcher, load_users
+from scheduler import ReminderScheduler, parse_due
+import asyncio
+import hashlib
 from fetchai import fetch
 from fetchai.crypto import Identity
 from fetchai.communication import (
@@ -19,12 +22,25 @@ from fetchai.communication import (
 
 class EmailRequest(Model):
     msg: str
+    to: Optional[str] = None
+    key: Optional[str] = None
 
 dotenv.load_dotenv()
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 API_URL = "https://umd.instructure.com"
 
-canvas = Canvas(API_URL, ACCESS_TOKEN)
+# One local Canvas mirror per user (CANVAS_USERS_FILE, or just ACCESS_TOKEN); only the
+# parts that are due for a refresh are fetched, on a thread pool off the event loop
+canvas_fetcher = CanvasFetcher(
+    load_users(os.getenv("CANVAS_USERS_FILE"), ACCESS_TOKEN),
+    snapshot_dir=os.getenv("CANVAS_SNAPSHOT_DIR", "."),
+    max_workers=int(os.getenv("CANVAS_SYNC_WORKERS", "8")),
+    deadline=float(os.getenv("CANVAS_SWEEP_DEADLINE", "10")),
+    max_in_flight_per_host=int(os.getenv("CANVAS_MAX_IN_FLIGHT_PER_HOST", "8")),
+    course_interval=float(os.getenv("CANVAS_COURSE_REFRESH", str(6 * 3600))),
+    assignment_interval=float(os.getenv("CANVAS_ASSIGNMENT_REFRESH", "300")),
+    default_api_url=API_URL
+)
 eastern = pytz.timezone('America/New_York')
 
 agent = Agent(name="Canvas", 
@@ -34,22 +50,64 @@ fund_agent_if_low(agent.wallet.address())
 
 notification_cache = NotificationCache()
 
+# Exact times each assignment enters a reminder window; the agent sleeps until the next one
+reminder_scheduler = ReminderScheduler()
+SYNC_INTERVAL = float(os.getenv("CANVAS_SYNC_INTERVAL", os.getenv("CANVAS_ASSIGNMENT_REFRESH", "300")))
+
   
 @agent.on_event("startup")
 async def introduce_agent(ctx: Context):
     ctx.logger.info(f"Hello, I'm agent {agent.name} and my address is {agent.address}.")
  
  
-@agent.on_interval(period=15.0) #make it like 15 minutes when actually deployed
-async def get_courses(ctx: Context):
-
-    now = datetime.now(eastern)
-    
-    # Define time windows
-    six_hours = now + timedelta(hours=6)
-    twelve_hours = now + timedelta(hours=12)
-    twenty_four_hours = now + timedelta(hours=120)
+# Held so the reminder loop is not garbage collected while it runs
+reminder_task = None
 
+@agent.on_event("startup")
+async def start_reminders(ctx: Context):
+    global reminder_task
+    reminder_task = asyncio.create_task(run_reminders(ctx))
+
+async def run_reminders(ctx: Context):
+    """Sleep until the next reminder is due or the next Canvas sync, whichever comes first"""
+    next_sync = datetime.now(timezone.utc)
+    while True:
+        try:
+            now = datetime.now(timezone.utc)
+            if now >= next_sync:
+                # Advanced first, so a failing sync is retried next interval rather than in a tight loop
+                next_sync = now + timedelta(seconds=SYNC_INTERVAL)
+                await sync_assignments(ctx)
+
+            for user_name, windows in reminder_scheduler.pop_due().items():
+                await send_reminders(ctx, user_name, windows)
+
+            wake_at = min(filter(None, (reminder_scheduler.next_time(), next_sync)))
+        except Exception:
+            # One bad sync or send must not stop every later reminder
+            ctx.logger.exception("Reminder loop iteration failed")
+            wake_at = min(next_sync, datetime.now(timezone.utc) + timedelta(seconds=15))
+
+        reminder_scheduler.wakeup.clear()
+        try:
+            await asyncio.wait_for(
+                reminder_scheduler.wakeup.wait(),
+                timeout=max(0.0, (wake_at - datetime.now(timezone.utc)).total_seconds())
+            )
+        except asyncio.TimeoutError:
+            pass
+
+async def sync_assignments(ctx: Context):
+    # Pull only what changed since the last sync, then reschedule from the local snapshots.
+    # Every user is rescheduled, so one whose sync failed or is late still gets
+    # reminders from its last snapshot
+    await canvas_fetcher.sweep()
+    for user_name, sync in canvas_fetcher.syncs.items():
+        changed = reminder_scheduler.update(user_name, sync.upcoming_assignments())
+        if changed:
+            ctx.logger.info(f"Scheduled reminders for {changed} new or changed assignments of user {user_name}")
+
+async def send_reminders(ctx: Context, user_name, windows):
     # Initialize dictionaries for each time window
     assignments_by_window = {
         '6h': [],
@@ -57,55 +115,47 @@ async def get_courses(ctx: Context):
         '72h': []
     }
 
-    # Fetch all active courses
-    courses = canvas.get_courses(enrollment_state="active", include=['favorites'])
-    starred_courses = [course for course in courses if getattr(course, 'is_favorite', False)]
-    print(starred_courses)
-
-    for course in starred_courses:
-        assignments = course.get_assignments()
+    for window, assignments in windows.items():
         for assignment in assignments:
-            if assignment.due_at:  # Check if due date exists
-                due_date = datetime.strptime(assignment.due_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
-                due_date = due_date.astimezone(eastern)
-                
-                assignment_info = {
-                    'course': course.name,
-                    'id': assignment.id,
-                    'assignment': assignment.name,
-                    'due_time': due_date.strftime("%Y-%m-%d %I:%M %p EST")
-                }
-
-                if now <= due_date <= six_hours and not notification_cache.has_been_sent(assignment_info['id'], '6h'):
-                    assignments_by_window['6h'].append(assignment_info)
-                elif six_hours < due_date <= twelve_hours and not notification_cache.has_been_sent(assignment_info['id'], '12h'):
-                    assignments_by_window['12h'].append(assignment_info)
-                elif twelve_hours < due_date <= twenty_four_hours and not notification_cache.has_been_sent(assignment_info['id'], '72h'):
-                    assignments_by_window['72h'].append(assignment_info)
-
-
-    all_assignments = assignments_by_window['6h'] + assignments_by_window['12h'] + assignments_by_window['72h']
-    print(all_assignments)
-    
-    if all_assignments:
+            due_date = parse_due(assignment['due_at']).astimezone(eastern)
+            assignment_info = {
+                'course': assignment['course'],
+                # Students share assignment ids, so notifications are tracked per user
+                'id': assignment['id'] if user_name is None else f"{user_name}:{assignment['id']}",
+                'assignment': assignment['assignment'],
+                'due_time': due_date.strftime("%Y-%m-%d %I:%M %p EST")
+            }
+            # Survives restarts, when the scheduler re-fires windows that are already open
+            if not notification_cache.has_been_sent(assignment_info['id'], window):
+                assignments_by_window[window].append(assignment_info)
+
+    if any(assignments_by_window.values()):
         gmail_agent_address = "agent1qv8wv3yq3l9ph60fnlmly3l3ms3w77yzv9z0hmxjdmu54tr6xwa4gk7uk5w" 
-        email_request = EmailRequest(msg=format_assignments(assignments_by_window))
+        message = format_assignments(assignments_by_window)
+        email_request = EmailRequest(
+            msg=message,
+            to=canvas_fetcher.users[user_name].get('email'),
+            # The same reminders always map to the same key, so the Gmail agent's outbox drops resends
+            key=hashlib.sha256(repr(sorted(
+                (window, str(assignment['id'])) for window, assignments in assignments_by_window.items()
+                for assignment in assignments
+            )).encode('utf-8')).hexdigest()
+        )
         response = await ctx.send(gmail_agent_address, email_request)
-        
-
-    ctx.logger.info(format_assignments(assignments_by_window))
+        ctx.logger.info(message)
 
 def format_assignments(assignments_by_window):
     if not any(assignments_by_window.values()):
         return "No assignments due in the next 120 hours in your starred courses!"
     
     formatted_output = "Upcoming Assignments:\n\n"
+    sent = []
     
     # Format 6-hour window assignments
     if assignments_by_window['6h']:
         formatted_output += "Due in the next 6 hours:\n"
         for assignment in assignments_by_window['6h']:
-            notification_cache.mark_as_sent(assignment['id'], '6h')
+            sent.append((assignment['id'], '6h'))
             formatted_output += f"Course: {assignment['course']}\n"
             formatted_output += f"Assignment: {assignment['assignment']}\n"
             formatted_output += f"Due: {assignment['due_time']}\n\n"
@@ -114,7 +164,7 @@ def format_assignments(assignments_by_window):
     if assignments_by_window['12h']:
         formatted_output += "Due in 6-12 hours:\n"
         for assignment in assignments_by_window['12h']:
-            notification_cache.mark_as_sent(assignment['id'], '12h')
+            sent.append((assignment['id'], '12h'))
             formatted_output += f"Course: {assignment['course']}\n"
             formatted_output += f"Assignment: {assignment['assignment']}\n"
             formatted_output += f"Due: {assignment['due_time']}\n\n"
@@ -123,11 +173,13 @@ def format_assignments(assignments_by_window):
     if assignments_by_window['72h']:
         formatted_output += "Due in 12-120 hours:\n"
         for assignment in assignments_by_window['72h']:
-            notification_cache.mark_as_sent(assignment['id'], '72h')
+            sent.append((assignment['id'], '72h'))
             formatted_output += f"Course: {assignment['course']}\n"
             formatted_output += f"Assignment: {assignment['assignment']}\n"
             formatted_output += f"Due: {assignment['due_time']}\n\n"
     
+    # One transaction for the whole digest instead of one write per assignment
+    notification_cache.mark_many_as_sent(sent)
     return formatted_output.rstrip()
 
 
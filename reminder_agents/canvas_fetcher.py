@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from canvas_sync import CanvasSync
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def load_users(users_file=None, default_token=None):
+    """Users to remind, as dicts with name, access_token, api_url and optional email.
+
+    `users_file` is a JSON list of such dicts. Without one, the single
+    ACCESS_TOKEN user is returned under the name None so its notification
+    history carries over unchanged.
+    """
+    if users_file and os.path.exists(users_file):
+        with open(users_file, 'r') as f:
+            return json.load(f)
+    if default_token:
+        return [{'name': None, 'access_token': default_token}]
+    return []
+
+
+class HostRateLimiter:
+    """Per-host throttle driven by Canvas's X-Rate-Limit-Remaining header.
+
+    At most `max_in_flight` requests go to the host at once. When the reported
+    remaining quota drops below `low_water`, or the host answers 403 "Rate
+    Limit Exceeded", new requests are held back for `cooldown` seconds so the
+    bucket can refill.
+    """
+
+    def __init__(self, max_in_flight=8, low_water=100.0, cooldown=2.0):
+        self.low_water = low_water
+        self.cooldown = cooldown
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+        self.stats = {'requests': 0, 'throttled': 0, 'rate_limited': 0}
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+            self.stats['requests'] += 1
+            if delay > 0:
+                self.stats['throttled'] += 1
+        if delay > 0:
+            time.sleep(delay)
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+    def observe(self, response):
+        """Update the throttle from a response; returns True if the request should be retried"""
+        limited = response.status_code == 403 and 'Rate Limit Exceeded' in response.text
+        remaining = response.headers.get('X-Rate-Limit-Remaining')
+        with self._lock:
+            if limited:
+                self.stats['rate_limited'] += 1
+            if limited or (remaining is not None and float(remaining) < self.low_water):
+                self._resume_at = max(self._resume_at, time.monotonic() + self.cooldown)
+        return limited
+
+
+class CanvasFetcher:
+    """Syncs many users' Canvas snapshots off the event loop.
+
+    Each user has its own CanvasSync; syncs run on `max_workers` threads and
+    share one HostRateLimiter per Canvas host. A sweep waits at most
+    `deadline` seconds: users still syncing after that keep going in the
+    background and are skipped by the sweep (their last snapshot is used),
+    so one slow account cannot hold up everyone else's reminders.
+    """
+
+    def __init__(self, users, snapshot_dir=".", max_workers=8, deadline=30.0, max_in_flight_per_host=8,
+                 course_interval=6 * 3600, assignment_interval=300, default_api_url=None):
+        self.deadline = deadline
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="canvas-sync")
+        self.limiters = {}
+        self.users = {}
+        self.syncs = {}
+        self._in_flight = {}
+        for user in users:
+            api_url = user.get('api_url', default_api_url)
+            host = urlsplit(api_url).netloc
+            limiter = self.limiters.setdefault(host, HostRateLimiter(max_in_flight=max_in_flight_per_host))
+            name = user.get('name')
+            self.users[name] = user
+            self.syncs[name] = CanvasSync(
+                api_url,
+                user['access_token'],
+                snapshot_file=os.path.join(
+                    snapshot_dir, "canvas_snapshot.json" if name is None else f"canvas_snapshot_{name}.json"
+                ),
+                course_interval=course_interval,
+                assignment_interval=assignment_interval,
+                rate_limiter=limiter
+            )
+
+    async def sweep(self):
+        """Sync every user not already syncing; returns the names that finished within the deadline"""
+        for name, sync in self.syncs.items():
+            if name not in self._in_flight:
+                self._in_flight[name] = asyncio.wrap_future(self.executor.submit(sync.sync))
+
+        pending = dict(self._in_flight)
+        done, late = await asyncio.wait(pending.values(), timeout=self.deadline)
+        finished = []
+        for name, future in pending.items():
+            if future not in done:
+                continue
+            del self._in_flight[name]
+            if future.exception() is not None:
+                logger.error(f"Canvas sync failed for user {name}, using last snapshot: {future.exception()}")
+            else:
+                finished.append(name)
+        if late:
+            logger.warning(f"{len(late)} Canvas syncs missed the {self.deadline}s sweep deadline")
+        return finished
+
+    def stats(self):
+        return {host: dict(limiter.stats) for host, limiter in self.limiters.items()}
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import time
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class CanvasSync:
+    """Incremental mirror of one user's starred courses and upcoming assignments.
+
+    The course list is refreshed every `course_interval` seconds, assignments
+    of each starred course every `assignment_interval` seconds. Each page of
+    assignments is requested with its own ETag from the previous sync, so an
+    unchanged course costs one 304 response per page, and only
+    `bucket=future` assignments are listed. Everything is kept in a local JSON snapshot, so reminders are
+    computed without touching the API and survive restarts. An optional
+    `rate_limiter` (see canvas_fetcher.HostRateLimiter) wraps every request.
+    """
+
+    def __init__(self, api_url, access_token, snapshot_file="canvas_snapshot.json",
+                 course_interval=6 * 3600, assignment_interval=300, timeout=(3.05, 20),
+                 rate_limiter=None, max_retries=3):
+        self.api_url = api_url.rstrip('/')
+        self.snapshot_file = snapshot_file
+        self.course_interval = course_interval
+        self.assignment_interval = assignment_interval
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {access_token}"
+        self.snapshot = self._load_snapshot()
+        self.stats = {'requests': 0, 'not_modified': 0}
+
+    def _load_snapshot(self):
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                pass
+        return {'courses': {}, 'courses_synced_at': 0}
+
+    def _save_snapshot(self):
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.snapshot, f)
+        os.replace(tmp_file, self.snapshot_file)
+
+    def _get(self, url, params, headers):
+        if self.rate_limiter is None:
+            self.stats['requests'] += 1
+            return self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        for _ in range(self.max_retries):
+            with self.rate_limiter:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            self.stats['requests'] += 1
+            if not self.rate_limiter.observe(response):
+                break
+        return response
+
+    def _get_pages(self, url, params=None, pages=None, keep=None):
+        """All pages of a list endpoint as (items, pages); items is None when every page is unchanged.
+
+        `pages` is the previous call's result: per page, its URL, ETag and
+        items (passed through `keep` before being stored). Each page is
+        requested with its own ETag and a 304 reuses that page's stored
+        items, so a change on any page is picked up.
+        """
+        previous = pages or []
+        pages = []
+        changed = not previous
+        while url:
+            i = len(pages)
+            known = previous[i] if i < len(previous) and previous[i]['url'] == url else None
+            headers = {'If-None-Match': known['etag']} if known and known['etag'] else {}
+            response = self._get(url, params, headers)
+            next_url = response.links.get('next', {}).get('url')
+            if response.status_code == 304:
+                self.stats['not_modified'] += 1
+                pages.append(known)
+                # A 304 may omit the Link header; follow the previous sync's next page
+                if next_url is None and i + 1 < len(previous):
+                    next_url = previous[i + 1]['url']
+            else:
+                response.raise_for_status()
+                pages.append({
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'items': [keep(item) if keep else item for item in response.json()]
+                })
+                changed = True
+            # The next link already carries the query string
+            url, params = next_url, None
+        if len(pages) != len(previous):
+            changed = True
+        return ([item for page in pages for item in page['items']] if changed else None), pages
+
+    def _sync_courses(self, now):
+        courses, _ = self._get_pages(
+            f"{self.api_url}/api/v1/courses",
+            params={'enrollment_state': 'active', 'include[]': 'favorites', 'per_page': 100}
+        )
+        known = self.snapshot['courses']
+        starred = {
+            str(course['id']): course['name'] for course in courses
+            if course.get('is_favorite') and course.get('name')
+        }
+        self.snapshot['courses'] = {
+            course_id: known.get(course_id, {'assignments': {}, 'pages': [], 'synced_at': 0}) | {'name': name}
+            for course_id, name in starred.items()
+        }
+        self.snapshot['courses_synced_at'] = now
+        logger.info(f"Synced course list: {len(starred)} starred courses")
+
+    def _sync_assignments(self, course_id, course, now):
+        assignments, pages = self._get_pages(
+            f"{self.api_url}/api/v1/courses/{course_id}/assignments",
+            params={'bucket': 'future', 'per_page': 100},
+            pages=course.get('pages'),
+            keep=lambda assignment: {
+                'id': assignment['id'],
+                'name': assignment['name'],
+                'due_at': assignment.get('due_at'),
+                'updated_at': assignment.get('updated_at')
+            }
+        )
+        course['synced_at'] = now
+        course['pages'] = pages
+        # Snapshots written before per-page ETags kept a single one
+        course.pop('etag', None)
+        if assignments is None:
+            return 0
+
+        previous = course['assignments']
+        course['assignments'] = {
+            str(assignment['id']): {
+                'name': assignment['name'],
+                'due_at': assignment['due_at'],
+                'updated_at': assignment.get('updated_at')
+            }
+            for assignment in assignments if assignment.get('due_at')
+        }
+        return sum(
+            1 for assignment_id, assignment in course['assignments'].items()
+            if previous.get(assignment_id, {}).get('updated_at') != assignment['updated_at']
+        )
+
+    def sync(self, now=None):
+        """Refresh whatever is due for a refresh; returns the number of new or changed assignments"""
+        now = time.time() if now is None else now
+        if now - self.snapshot['courses_synced_at'] >= self.course_interval:
+            self._sync_courses(now)
+
+        changed = 0
+        for course_id, course in self.snapshot['courses'].items():
+            if now - course['synced_at'] >= self.assignment_interval:
+                changed += self._sync_assignments(course_id, course, now)
+        self._save_snapshot()
+        if changed:
+            logger.info(f"Synced assignments: {changed} new or changed")
+        return changed
+
+    def upcoming_assignments(self):
+        """Every snapshot assignment with a due date, as dicts with course, id, assignment and due_at"""
+        return [
+            {
+                'course': course['name'],
+                'id': int(assignment_id),
+                'assignment': assignment['name'],
+                'due_at': assignment['due_at']
+            }
+            for course in self.snapshot['courses'].values()
+            for assignment_id, assignment in course['assignments'].items()
+        ]
@@ -1,84 +1,108 @@
 from uagents import Agent, Context, Model
+from typing import Optional
 from uagents.setup import fund_agent_if_low
 import os 
-import pickle
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from email.mime.text import MIMEText
-import base64
 from dotenv import load_dotenv
+from gmail_client import GmailCredentials, GmailSender
+from outbox import Outbox, TokenBucket
+import asyncio
+import time
+import uuid
 load_dotenv()
 
 agent = Agent(name="Gmail", 
               port=8001, 
               endpoint=["http://localhost:8001/submit"])
 fund_agent_if_low(agent.wallet.address())
-SCOPES = ['https://www.googleapis.com/auth/gmail.send']
 
 class EmailRequest(Model):
     msg: str
+    to: Optional[str] = None
+    key: Optional[str] = None
 
-def get_gmail_service():
-    creds = None
-    # The file token.pickle stores the user's access and refresh tokens
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
-    
-    # If credentials are not valid or don't exist, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
+# Long-lived Gmail clients; sends are queued and go out in batches off the event loop
+gmail_sender = GmailSender(
+    GmailCredentials(),
+    num_workers=int(os.getenv("GMAIL_SEND_WORKERS", "2")),
+    batch_size=int(os.getenv("GMAIL_BATCH_SIZE", "50")),
+    linger=float(os.getenv("GMAIL_BATCH_LINGER", "0.2"))
+)
+
+# Requests are queued durably and merged per recipient into one digest per window
+outbox = Outbox(
+    os.getenv("OUTBOX_FILE", "outbox.sqlite3"),
+    window=float(os.getenv("DIGEST_WINDOW", "300")),
+    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+)
+outbox_wakeup = asyncio.Event()
 
-    return build('gmail', 'v1', credentials=creds)
+# Gmail send quota of the sending account (default well under the consumer limit)
+send_quota = TokenBucket(
+    rate=float(os.getenv("GMAIL_SENDS_PER_MINUTE", "20")) / 60,
+    capacity=float(os.getenv("GMAIL_SEND_BURST", "10"))
+)
 
-def send_email_notification(message):
+async def send_email_notification(digest_id, message, to=None):
+    await asyncio.sleep(send_quota.reserve())
     try:
-        service = get_gmail_service()
-        
-        # Create the email message
-        email_msg = MIMEText(message)
-        email_msg['to'] = os.getenv("EMAIL_RECEIVER")
-        email_msg['subject'] = "Canvas Assignments Due Tomorrow"
-        
-        # Encode the message
-        raw_msg = base64.urlsafe_b64encode(email_msg.as_bytes()).decode('utf-8')
-        
-        # Send the email
-        try:
-            message = service.users().messages().send(
-                userId='me', 
-                body={'raw': raw_msg}
-            ).execute()
-            print(f"Email sent successfully. Message Id: {message['id']}")
-            return True
-        except Exception as e:
-            print(f"An error occurred while sending the email: {e}")
-            return False
-            
+        message_id = await asyncio.wrap_future(gmail_sender.submit(
+            to or os.getenv("EMAIL_RECEIVER"),
+            "Canvas Assignments Due Tomorrow",
+            message
+        ))
+        outbox.mark_sent(digest_id, message_id)
+        print(f"Email sent successfully. Message Id: {message_id}")
+        return True
     except Exception as e:
-        print(f"Error in email service: {e}")
+        outbox.mark_failed(digest_id)
+        print(f"An error occurred while sending the email: {e}")
         return False
+
+# Held so the outbox loop is not garbage collected while it runs
+outbox_task = None
+
+async def run_outbox(ctx: Context):
+    """Seal and send digests as their windows close, sleeping in between"""
+    while True:
+        try:
+            outbox.seal_ready()
+            digests = outbox.due()
+            if digests:
+                sent = await asyncio.gather(*(
+                    send_email_notification(digest_id, body, recipient or None)
+                    for digest_id, recipient, body in digests
+                ))
+                ctx.logger.info(f"Sent {sum(sent)} of {len(digests)} digests; outbox: {outbox.stats()}, gmail: {gmail_sender.stats()}")
+
+            next_event = outbox.next_event()
+        except Exception:
+            # A transient SQLite or Gmail error must not stop delivery; the outbox keeps everything queued
+            ctx.logger.exception("Outbox iteration failed")
+            next_event = time.time() + 30
+
+        outbox_wakeup.clear()
+        try:
+            await asyncio.wait_for(
+                outbox_wakeup.wait(),
+                timeout=None if next_event is None else max(0.0, next_event - time.time())
+            )
+        except asyncio.TimeoutError:
+            pass
     
 @agent.on_event("startup")
 async def introduce_agent(ctx: Context):
+    global outbox_task
     ctx.logger.info(f"Hello, I'm agent {agent.name} and my address is {agent.address}.")
+    outbox_task = asyncio.create_task(run_outbox(ctx))
 
 @agent.on_query(model=EmailRequest)
 async def handle_email_request(ctx: Context, sender: str, request: EmailRequest):
-    if send_email_notification(request.msg):
-        ctx.logger.info(f"Email sent successfully.")
+    # An empty recipient means EMAIL_RECEIVER, resolved when the digest is sent
+    if outbox.add(request.key or uuid.uuid4().hex, request.to or '', request.msg):
+        ctx.logger.info(f"Queued email request: {request}")
+        outbox_wakeup.set()
     else:
-        ctx.logger.info(f"Failed to send email.")
-    ctx.logger.info(f"Received email request: {request}")
+        ctx.logger.info(f"Ignoring duplicate email request {request.key}")
 
 if __name__ == "__main__":
     agent.run()
\ No newline at end of file
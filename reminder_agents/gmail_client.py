@@ -0,0 +1,152 @@
+from concurrent.futures import Future
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build
+from email.mime.text import MIMEText
+from queue import Queue, Empty
+import base64
+import datetime
+import logging
+import os
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/gmail.send']
+
+
+class GmailCredentials:
+    """OAuth credentials loaded once and refreshed shortly before they expire"""
+
+    def __init__(self, token_file='token.pickle', client_secrets_file='credentials.json', refresh_margin=300):
+        self.token_file = token_file
+        self.client_secrets_file = client_secrets_file
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self._lock = threading.Lock()
+        self.creds = None
+        # The file token.pickle stores the user's access and refresh tokens
+        if os.path.exists(token_file):
+            with open(token_file, 'rb') as token:
+                self.creds = pickle.load(token)
+
+    def get(self):
+        with self._lock:
+            creds = self.creds
+            # google-auth keeps expiry as a naive UTC datetime
+            expiring = creds and creds.expiry and creds.expiry - self.refresh_margin <= datetime.datetime.utcnow()
+            if creds and creds.valid and not expiring:
+                return creds
+            if creds and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_file, SCOPES)
+                creds = flow.run_local_server(port=0)
+            # Save the credentials for the next run
+            with open(self.token_file, 'wb') as token:
+                pickle.dump(creds, token)
+            self.creds = creds
+            return creds
+
+
+class GmailSender:
+    """Sends emails through long-lived Gmail clients on a pool of worker threads.
+
+    Service objects are built once per worker from the discovery document
+    bundled with google-api-python-client (no discovery fetch) and reused;
+    they are not thread-safe, hence one per worker. Each worker drains up to
+    `batch_size` queued messages, waiting at most `linger` seconds for more
+    to arrive, and sends them as a single Gmail batch HTTP request.
+    """
+
+    def __init__(self, credentials, num_workers=2, batch_size=50, linger=0.2, sender_name='gmail'):
+        self.credentials = credentials
+        self.batch_size = batch_size
+        self.linger = linger
+        self._queue = Queue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'sent': 0, 'failed': 0, 'batches': 0}
+        self._started = time.monotonic()
+        self._workers = [
+            threading.Thread(target=self._run, name=f"{sender_name}-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, to, subject, body):
+        """Queue one email; the returned future resolves to the Gmail message id"""
+        email_msg = MIMEText(body)
+        email_msg['to'] = to
+        email_msg['subject'] = subject
+        raw_msg = base64.urlsafe_b64encode(email_msg.as_bytes()).decode('utf-8')
+
+        future = Future()
+        self._queue.put((raw_msg, future))
+        with self._lock:
+            self._stats['queued'] += 1
+        return future
+
+    def _service(self):
+        creds = self.credentials.get()
+        if getattr(self._local, 'creds', None) is not creds:
+            self._local.service = build('gmail', 'v1', credentials=creds, cache_discovery=False, static_discovery=True)
+            self._local.creds = creds
+        return self._local.service
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._send(batch)
+            except Exception as e:
+                logger.error(f"Gmail batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            with self._lock:
+                self._stats['batches'] += 1
+                for _, future in batch:
+                    self._stats['failed' if future.exception() else 'sent'] += 1
+
+    def _send(self, batch):
+        service = self._service()
+        messages = service.users().messages()
+        if len(batch) == 1:
+            raw_msg, future = batch[0]
+            future.set_result(messages.send(userId='me', body={'raw': raw_msg}).execute()['id'])
+            return
+
+        futures = {}
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                futures[request_id].set_exception(exception)
+            else:
+                futures[request_id].set_result(response['id'])
+
+        request = service.new_batch_http_request(callback=on_response)
+        for i, (raw_msg, future) in enumerate(batch):
+            futures[str(i)] = future
+            request.add(messages.send(userId='me', body={'raw': raw_msg}), request_id=str(i))
+        request.execute()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = time.monotonic() - self._started
+        stats['pending'] = self._queue.qsize()
+        stats['avg_batch_size'] = round((stats['sent'] + stats['failed']) / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['sent_per_minute'] = round(60 * stats['sent'] / elapsed, 2) if elapsed else 0.0
+        return stats
@@ -1,39 +1,65 @@
 import json
-from pathlib import Path
-import os 
+import os
+import sqlite3
+import threading
 from datetime import datetime, timezone, timedelta
-# Simple Cache Implementation using JSON
+# Notification history in SQLite: one indexed row per (assignment, window)
 class NotificationCache:
-    def __init__(self, cache_file="notification_cache.json"):
-        self.cache_file = cache_file
-        self.cache = self._load_cache()
+    def __init__(self, db_file="notification_cache.sqlite3", legacy_file="notification_cache.json"):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        # WAL keeps every commit crash-safe without rewriting anything
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS notifications ("
+            "assignment_id TEXT NOT NULL, window TEXT NOT NULL, sent_at REAL NOT NULL, "
+            "PRIMARY KEY (assignment_id, window))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS notifications_sent_at ON notifications (sent_at)")
+        self._db.commit()
+        self._import_legacy(legacy_file)
 
-    def _load_cache(self):
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
-
-    def _save_cache(self):
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f)
+    def _import_legacy(self, legacy_file):
+        """One-time import of the old whole-file JSON cache, which is renamed afterwards"""
+        if not legacy_file or not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                legacy = json.load(f)
+        except json.JSONDecodeError:
+            legacy = {}
+        rows = []
+        for cache_key, sent_at in legacy.items():
+            assignment_id, _, window = cache_key.rpartition('_')
+            rows.append((assignment_id, window, datetime.fromisoformat(sent_at).timestamp()))
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR IGNORE INTO notifications VALUES (?, ?, ?)", rows)
+        os.replace(legacy_file, f"{legacy_file}.imported")
 
     def has_been_sent(self, assignment_id, window):
-        cache_key = f"{assignment_id}_{window}"
-        return cache_key in self.cache
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM notifications WHERE assignment_id = ? AND window = ?",
+                (str(assignment_id), window)
+            ).fetchone()
+        return row is not None
 
     def mark_as_sent(self, assignment_id, window):
-        cache_key = f"{assignment_id}_{window}"
-        self.cache[cache_key] = datetime.now().isoformat()
-        self._save_cache()
+        self.mark_many_as_sent([(assignment_id, window)])
+
+    def mark_many_as_sent(self, notifications):
+        """Record many (assignment_id, window) pairs in a single transaction"""
+        sent_at = datetime.now(timezone.utc).timestamp()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO notifications VALUES (?, ?, ?)",
+                [(str(assignment_id), window, sent_at) for assignment_id, window in notifications]
+            )
 
     def clean_old_entries(self, days=7):
-        now = datetime.now()
-        self.cache = {
-            k: v for k, v in self.cache.items()
-            if (now - datetime.fromisoformat(v)).days < days
-        }
-        self._save_cache()
\ No newline at end of file
+        # Range delete over the sent_at index; nothing else is read or rewritten
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).timestamp()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM notifications WHERE sent_at < ?", (cutoff,))
@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+import time
+
+
+class TokenBucket:
+    """Allows `rate` sends per second on average with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take one token; returns how many seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class Outbox:
+    """Durable queue of outgoing notifications, merged into one digest per recipient.
+
+    Notifications are stored under a caller-supplied key, so a request that
+    is delivered twice is only queued once. A recipient's pending
+    notifications are sealed into a digest once the oldest has waited
+    `window` seconds. Digests are retried with exponential backoff until
+    they are marked sent; a sent digest is never picked up again.
+    """
+
+    def __init__(self, db_file="outbox.sqlite3", window=300.0, max_attempts=8, base_backoff=30.0):
+        self.window = window
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS notifications ("
+            " key TEXT PRIMARY KEY, recipient TEXT NOT NULL, body TEXT NOT NULL,"
+            " created_at REAL NOT NULL, digest_id INTEGER);"
+            "CREATE INDEX IF NOT EXISTS notifications_pending ON notifications (digest_id, recipient, created_at);"
+            "CREATE TABLE IF NOT EXISTS digests ("
+            " id INTEGER PRIMARY KEY, recipient TEXT NOT NULL, body TEXT NOT NULL, status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, message_id TEXT);"
+            "CREATE INDEX IF NOT EXISTS digests_due ON digests (status, next_attempt_at);"
+        )
+        self._db.commit()
+
+    def add(self, key, recipient, body, now=None):
+        """Queue a notification; returns False if this key was already queued"""
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO notifications (key, recipient, body, created_at) VALUES (?, ?, ?, ?)",
+                (key, recipient, body, now or time.time())
+            )
+        return cursor.rowcount == 1
+
+    def seal_ready(self, now=None):
+        """Merge the pending notifications of every recipient whose window has closed; returns how many digests were made"""
+        now = now or time.time()
+        sealed = 0
+        with self._lock, self._db:
+            recipients = [row[0] for row in self._db.execute(
+                "SELECT recipient FROM notifications WHERE digest_id IS NULL "
+                "GROUP BY recipient HAVING MIN(created_at) <= ?",
+                (now - self.window,)
+            )]
+            for recipient in recipients:
+                rows = self._db.execute(
+                    "SELECT key, body FROM notifications WHERE digest_id IS NULL AND recipient = ? ORDER BY created_at",
+                    (recipient,)
+                ).fetchall()
+                digest_id = self._db.execute(
+                    "INSERT INTO digests (recipient, body, status, next_attempt_at) VALUES (?, ?, 'pending', ?)",
+                    (recipient, "\n\n".join(body for _, body in rows), now)
+                ).lastrowid
+                self._db.executemany(
+                    "UPDATE notifications SET digest_id = ? WHERE key = ?",
+                    [(digest_id, key) for key, _ in rows]
+                )
+                sealed += 1
+        return sealed
+
+    def due(self, now=None, limit=100):
+        """Digests waiting to be sent, as (id, recipient, body) tuples"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, recipient, body FROM digests WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (now or time.time(), limit)
+            ).fetchall()
+
+    def mark_sent(self, digest_id, message_id):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE digests SET status = 'sent', message_id = ? WHERE id = ?", (message_id, digest_id)
+            )
+
+    def mark_failed(self, digest_id, now=None):
+        """Schedule a retry with exponential backoff, or give up after `max_attempts`"""
+        now = now or time.time()
+        with self._lock, self._db:
+            attempts = self._db.execute("SELECT attempts FROM digests WHERE id = ?", (digest_id,)).fetchone()[0] + 1
+            self._db.execute(
+                "UPDATE digests SET attempts = ?, next_attempt_at = ?, status = ? WHERE id = ?",
+                (
+                    attempts,
+                    now + self.base_backoff * 2 ** (attempts - 1),
+                    'failed' if attempts >= self.max_attempts else 'pending',
+                    digest_id
+                )
+            )
+
+    def next_event(self):
+        """Earliest time a digest can be sealed or sent, or None if the outbox is idle"""
+        with self._lock:
+            oldest = self._db.execute("SELECT MIN(created_at) FROM notifications WHERE digest_id IS NULL").fetchone()[0]
+            retry = self._db.execute("SELECT MIN(next_attempt_at) FROM digests WHERE status = 'pending'").fetchone()[0]
+        times = [t for t in (oldest + self.window if oldest is not None else None, retry) if t is not None]
+        return min(times) if times else None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._db.execute("SELECT status, COUNT(*) FROM digests GROUP BY status").fetchall())
+            stats['queued_notifications'] = self._db.execute(
+                "SELECT COUNT(*) FROM notifications WHERE digest_id IS NULL"
+            ).fetchone()[0]
+        return stats
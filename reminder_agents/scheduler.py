@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+import heapq
+import itertools
+
+# Reminder windows, widest first: a window opens `lead` before the due date
+WINDOWS = (
+    ('72h', timedelta(hours=120)),
+    ('12h', timedelta(hours=12)),
+    ('6h', timedelta(hours=6))
+)
+
+
+def parse_due(due_at):
+    return datetime.strptime(due_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+class ReminderScheduler:
+    """Min-heap of the exact moments assignments enter each reminder window.
+
+    `update` is fed the assignments of a user after every sync; new
+    assignments and changed due dates get one event per window boundary still
+    ahead of them (the window they are already in fires immediately). Events
+    whose assignment disappeared or was rescheduled are skipped lazily when
+    they reach the top of the heap. `wakeup` is set whenever the earliest
+    event may have moved, so a sleeping loop can recompute its timeout.
+    """
+
+    def __init__(self):
+        self._heap = []  # (fire_at, seq, user, assignment_id, window, due_at)
+        self._seq = itertools.count()  # tie-breaker, users and ids need not be comparable
+        self._assignments = {}  # (user, assignment_id) -> assignment dict
+        self.wakeup = asyncio.Event()
+
+    def update(self, user, assignments, now=None):
+        """Reconcile one user's assignments; returns how many were new or rescheduled"""
+        now = now or datetime.now(timezone.utc)
+        current = {(user, assignment['id']): assignment for assignment in assignments if assignment['due_at']}
+        for key in [key for key in self._assignments if key[0] == user and key not in current]:
+            del self._assignments[key]
+
+        changed = 0
+        for key, assignment in current.items():
+            known = self._assignments.get(key)
+            self._assignments[key] = assignment
+            if known is not None and known['due_at'] == assignment['due_at']:
+                continue
+            changed += 1
+            due = parse_due(assignment['due_at'])
+            for i, (window, lead) in enumerate(WINDOWS):
+                # Skip windows already superseded by a narrower one
+                closes_at = due - WINDOWS[i + 1][1] if i + 1 < len(WINDOWS) else due
+                if now >= closes_at:
+                    continue
+                heapq.heappush(self._heap, (max(due - lead, now), next(self._seq), user, assignment['id'], window, assignment['due_at']))
+        if changed:
+            self.wakeup.set()
+        return changed
+
+    def next_time(self):
+        """When the earliest live event fires, or None if nothing is scheduled"""
+        while self._heap and not self._live(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _live(self, event):
+        assignment = self._assignments.get((event[2], event[3]))
+        return assignment is not None and assignment['due_at'] == event[5]
+
+    def pop_due(self, now=None):
+        """Events that are due, grouped as {user: {window: [assignment, ...]}}"""
+        now = now or datetime.now(timezone.utc)
+        narrowest = {}  # (user, assignment_id) -> index into WINDOWS
+        while self._heap and self._heap[0][0] <= now:
+            event = heapq.heappop(self._heap)
+            _, _, user, assignment_id, window, due_at = event
+            if self._live(event) and now < parse_due(due_at):
+                index = [name for name, _ in WINDOWS].index(window)
+                narrowest[(user, assignment_id)] = max(index, narrowest.get((user, assignment_id), index))
+
+        # An assignment that crossed several boundaries at once is only reported in the narrowest
+        due = {}
+        for (user, assignment_id), index in narrowest.items():
+            windows = due.setdefault(user, {window: [] for window, _ in WINDOWS})
+            windows[WINDOWS[index][0]].append(self._assignments[(user, assignment_id)])
+        return due
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+import numpy as np
+import re
+import threading
+import time
+
+
+def normalize_query(query):
+    """Canonical form used for exact-match lookups"""
+    return re.sub(r'\s+', ' ', query).strip().strip('?!. ').lower()
+
+
+class AnswerCache:
+    """Two-level answer cache for RAG queries.
+
+    Level one is an exact match on the normalized query text. Level two is a
+    nearest-neighbour match on the query embedding, accepted when the cosine
+    similarity reaches `similarity_threshold`. Entries are evicted LRU once
+    `max_entries` is reached and expire after `ttl_seconds`. Every entry is
+    tagged with the index version it was answered against; a lookup with a
+    different version clears the cache, and answers for a version that has
+    been retired are not stored.
+    """
+
+    def __init__(self, similarity_threshold=0.95, max_entries=1024, ttl_seconds=3600):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # normalized query -> (answer, unit embedding, stored_at)
+        self._matrix = None  # stacked embeddings, rebuilt lazily after writes
+        self._matrix_keys = []
+        self._version = None
+        self._retired = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            'exact_hits': 0,
+            'semantic_hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'exact_seconds': 0.0,
+            'semantic_seconds': 0.0,
+            'miss_seconds': 0.0
+        }
+
+    def _check_version(self, version):
+        """Switch the cache to `version`; False if that version has been retired"""
+        if version in self._retired:
+            return False
+        if version != self._version:
+            if self._entries:
+                self._stats['invalidations'] += 1
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+        return True
+
+    def _expired(self, stored_at):
+        return time.time() - stored_at > self.ttl_seconds
+
+    def get_exact(self, query, version):
+        started = time.perf_counter()
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key) if self._check_version(version) else None
+            if entry and self._expired(entry[2]):
+                del self._entries[key]
+                self._matrix = None
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self._stats['exact_hits'] += 1
+            self._stats['exact_seconds'] += time.perf_counter() - started
+        return entry[0] if entry else None
+
+    def get_similar(self, embedding, version):
+        started = time.perf_counter()
+        answer = None
+        with self._lock:
+            if self._check_version(version) and self._entries:
+                if self._matrix is None:
+                    self._matrix_keys = list(self._entries)
+                    self._matrix = np.vstack([self._entries[key][1] for key in self._matrix_keys])
+                scores = self._matrix @ _unit(embedding)
+                best = int(np.argmax(scores))
+                key = self._matrix_keys[best]
+                entry = self._entries.get(key)
+                if scores[best] >= self.similarity_threshold and entry and not self._expired(entry[2]):
+                    self._entries.move_to_end(key)
+                    self._stats['semantic_hits'] += 1
+                    answer = entry[0]
+            self._stats['semantic_seconds'] += time.perf_counter() - started
+        return answer
+
+    def put(self, query, embedding, answer, version, miss_seconds=0.0):
+        """Store a freshly generated answer; `miss_seconds` is the cost of generating it"""
+        key = normalize_query(query)
+        with self._lock:
+            self._stats['misses'] += 1
+            self._stats['miss_seconds'] += miss_seconds
+            # A query that finished on a replaced index must not flip the cache back
+            if not self._check_version(version):
+                return
+            self._entries[key] = (answer, _unit(embedding), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def replace_version(self, old_version, new_version):
+        """Stop caching answers for `old_version`; the index is switching to `new_version`"""
+        with self._lock:
+            self._retired.add(old_version)
+            self._retired.discard(new_version)
+            self._check_version(new_version)
+
+    def invalidate(self):
+        with self._lock:
+            if self._entries:
+                self._stats['invalidations'] += 1
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['exact_hits'] + stats['semantic_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['exact_hits'] + stats['semantic_hits']) / lookups, 4) if lookups else 0.0
+        # Average latency per level, in milliseconds
+        stats['exact_avg_ms'] = round(1000 * stats['exact_seconds'] / lookups, 3) if lookups else 0.0
+        semantic_lookups = stats['semantic_hits'] + stats['misses']
+        stats['semantic_avg_ms'] = round(1000 * stats['semantic_seconds'] / semantic_lookups, 3) if semantic_lookups else 0.0
+        stats['miss_avg_ms'] = round(1000 * stats['miss_seconds'] / stats['misses'], 3) if stats['misses'] else 0.0
+        return stats
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
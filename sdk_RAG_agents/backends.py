@@ -0,0 +1,139 @@
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from typing import Any, List, Optional
+import hashlib
+import math
+import numpy as np
+import os
+import threading
+import time
+
+
+class LocalEmbeddings(Embeddings):
+    """CPU sentence-transformers embeddings, batched and optionally spread over processes.
+
+    With `num_workers` > 1, every `embed_documents` call (ingest batches) is
+    split across a pool of worker processes, one model copy each, so ingest
+    uses several cores; `embed_query` stays in process. The pool's input and
+    output queues are shared and its chunk ids restart on every call, so
+    calls from concurrent ingest threads are serialized.
+    """
+
+    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", batch_size=64, num_workers=1):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        if num_workers > 1:
+            self._pool = self.model.start_multi_process_pool(target_devices=['cpu'] * num_workers)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self._pool is not None:
+            with self._pool_lock:
+                vectors = self.model.encode_multi_process(
+                    texts,
+                    self._pool,
+                    batch_size=self.batch_size,
+                    # One chunk per process, so a single ingest batch keeps every core busy
+                    chunk_size=max(1, math.ceil(len(texts) / self.num_workers)),
+                    normalize_embeddings=True
+                )
+        else:
+            vectors = self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.model.encode([text], batch_size=1, normalize_embeddings=True)[0]
+        return np.asarray(vector, dtype=np.float32).tolist()
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic embeddings for offline benchmarks.
+
+    Each text maps to a unit vector built from hashes of its words, so equal
+    texts get equal vectors and texts sharing words are close, with no model
+    and no network. `latency` seconds per call can be added to mimic a real
+    backend.
+    """
+
+    def __init__(self, size=384, latency=0.0):
+        self.size = size
+        self.latency = latency
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], 'little') % self.size] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeLLM(LLM):
+    """Deterministic LLM for offline benchmarks: the answer is a digest of the prompt.
+
+    `latency` seconds per call can be set to mimic the cost of a real
+    generation.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+        return f"Answer {digest} from a {len(prompt)}-character prompt."
+
+
+def make_embeddings(backend):
+    """Embeddings for RAG_EMBEDDINGS and the name the vector index is keyed by"""
+    if backend == 'local':
+        model = os.getenv("RAG_LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        embeddings = LocalEmbeddings(
+            model,
+            batch_size=int(os.getenv("RAG_EMBED_BATCH_SIZE", "64")),
+            num_workers=int(os.getenv("RAG_LOCAL_EMBED_PROCESSES", "1"))
+        )
+        return embeddings, f"local:{model}"
+    if backend == 'fake':
+        size = int(os.getenv("RAG_FAKE_EMBEDDING_SIZE", "384"))
+        return FakeEmbeddings(size, latency=float(os.getenv("RAG_FAKE_LATENCY", "0"))), f"fake:{size}"
+
+    from langchain_openai import OpenAIEmbeddings
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("Missing OpenAI API Key")
+    model = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-ada-002")
+    return OpenAIEmbeddings(model=model), model
+
+
+def make_llm(backend):
+    """LLM for RAG_LLM: 'openai', 'local' (a Hugging Face text-generation model) or 'fake'"""
+    if backend == 'local':
+        from langchain_community.llms import HuggingFacePipeline
+        return HuggingFacePipeline.from_model_id(
+            model_id=os.getenv("RAG_LOCAL_LLM_MODEL", "google/flan-t5-base"),
+            task=os.getenv("RAG_LOCAL_LLM_TASK", "text2text-generation"),
+            device=-1,
+            pipeline_kwargs={'max_new_tokens': int(os.getenv("RAG_LOCAL_LLM_MAX_TOKENS", "256"))}
+        )
+    if backend == 'fake':
+        return FakeLLM(latency=float(os.getenv("RAG_FAKE_LATENCY", "0")))
+
+    from langchain_openai import OpenAI
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("Missing OpenAI API Key")
+    return OpenAI()
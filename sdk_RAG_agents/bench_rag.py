@@ -0,0 +1,64 @@
+from dotenv import load_dotenv
+import logging
+import os
+import sys
+import time
+
+DEFAULT_QUERIES = [
+    "What is a bidirectional LSTM?",
+    "How are the forward and backward hidden states combined?",
+    "Which datasets were used in the experiments?",
+    "What are the gate equations of the LSTM cell?",
+    "How does the model compare to a unidirectional LSTM?"
+]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def benchmark(pdf_path, queries, rounds=20):
+    """Time ingest and uncached queries with whatever backends the environment selects"""
+    # Imported late so RAG_* settings from the command line are in place first
+    from rag_agent1 import RAGProcessor
+
+    processor = RAGProcessor(pdf_path)
+    print(f"ingest: {processor.ingest_report}")
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(rounds):
+        for query in queries:
+            # Every query misses the answer cache so retrieval and generation are measured
+            processor.answer_cache.invalidate()
+            query_started = time.perf_counter()
+            processor.process_query(query)
+            latencies.append(time.perf_counter() - query_started)
+    elapsed = time.perf_counter() - started
+    print(
+        f"queries: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.1f}/s), "
+        f"p50 {1000 * percentile(latencies, 0.5):.1f}ms, p99 {1000 * percentile(latencies, 0.99):.1f}ms"
+    )
+
+    processor.answer_cache.invalidate()
+    started = time.perf_counter()
+    processor.process_queries([f"{query} ({i})" for i in range(rounds) for query in queries])
+    elapsed = time.perf_counter() - started
+    print(f"batch: {rounds * len(queries)} queries in {elapsed:.2f}s ({rounds * len(queries) / elapsed:.1f}/s)")
+    if processor.compressor is not None:
+        print(f"context: {processor.compressor.stats()}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.WARNING)
+    if len(sys.argv) not in (2, 3):
+        print("Usage: RAG_EMBEDDINGS=fake RAG_LLM=fake python bench_rag.py <path_to_pdf_or_directory> [queries_file]")
+        sys.exit(1)
+    os.environ.setdefault("RAG_INDEX_DIR", ".rag_index_bench")
+    queries = DEFAULT_QUERIES
+    if len(sys.argv) == 3:
+        with open(sys.argv[2]) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    benchmark(sys.argv[1], queries)
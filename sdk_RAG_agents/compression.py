@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from answer_cache import normalize_query
+from hybrid import tokenize
+from langchain.schema import Document
+import hashlib
+import re
+import threading
+import time
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"(\[])')
+_WORDISH = re.compile(r"\w+|[^\w\s]")
+
+
+def split_sentences(text):
+    # PDF text breaks lines mid-sentence, so whitespace is normalised first
+    return [sentence for sentence in _SENTENCE_END.split(re.sub(r'\s+', ' ', text).strip()) if sentence]
+
+
+class TokenCounter:
+    """Counts and truncates text in prompt tokens: tiktoken when installed, otherwise words and punctuation"""
+
+    def __init__(self):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            self._encoding = None
+
+    def count(self, text):
+        if self._encoding is None:
+            return len(_WORDISH.findall(text))
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens):
+        """The longest prefix of `text` that is at most `max_tokens` tokens"""
+        if max_tokens <= 0:
+            return ''
+        if self._encoding is None:
+            matches = list(_WORDISH.finditer(text))
+            return text if len(matches) <= max_tokens else text[:matches[max_tokens - 1].end()]
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+
+
+class ContextCompressor:
+    """Builds the "stuff" prompt's context from the most relevant sentences of the retrieved chunks.
+
+    Chunks are split into sentences. A sentence whose words are mostly
+    contained in a sentence already seen (chunk overlap, repeated headers)
+    is dropped, keeping the longer of the two. The rest are ranked by the
+    IDF-weighted share of query terms they contain and taken greedily until
+    `token_budget` is reached; a sentence that does not fit is skipped, so
+    the budget is never exceeded. If no sentence fits at all, the best one
+    (or the top chunk, when it has no sentences) is truncated to the budget
+    rather than sending no context. Chosen sentences go back into their chunks
+    in their original order. Results are cached LRU per (query, chunk set).
+    """
+
+    def __init__(self, token_budget=512, duplicate_overlap=0.8, max_entries=1024):
+        self.token_budget = token_budget
+        self.duplicate_overlap = duplicate_overlap
+        self.max_entries = max_entries
+        self.tokens = TokenCounter()
+        self._cache = OrderedDict()  # (normalized query, chunk digests) -> (Documents, tokens before, tokens after)
+        self._lock = threading.Lock()
+        self._stats = {'queries': 0, 'cache_hits': 0, 'tokens_before': 0, 'tokens_after': 0, 'seconds': 0.0}
+
+    def compress(self, query, docs, idf):
+        """Compressed Documents for the query and a report of the tokens saved and time taken.
+
+        `idf` maps a term to its inverse document frequency over the index.
+        """
+        started = time.perf_counter()
+        key = (normalize_query(query), tuple(
+            hashlib.blake2b(doc.page_content.encode('utf-8'), digest_size=16).digest() for doc in docs
+        ))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+
+        hit = cached is not None
+        if not hit:
+            cached = self._compress(query, docs, idf)
+            with self._lock:
+                self._cache[key] = cached
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        compressed, tokens_before, tokens_after = cached
+        report = {
+            'tokens_before': tokens_before,
+            'tokens_after': tokens_after,
+            'tokens_saved': tokens_before - tokens_after,
+            'seconds': time.perf_counter() - started,
+            'cached': hit
+        }
+        with self._lock:
+            self._stats['queries'] += 1
+            self._stats['cache_hits'] += hit
+            self._stats['tokens_before'] += tokens_before
+            self._stats['tokens_after'] += tokens_after
+            self._stats['seconds'] += report['seconds']
+        return compressed, report
+
+    def _compress(self, query, docs, idf):
+        tokens_before = sum(self.tokens.count(doc.page_content) for doc in docs)
+
+        # (chunk rank, position, text, terms); near-duplicates keep the longer sentence
+        sentences = []
+        for rank, doc in enumerate(docs):
+            for position, text in enumerate(split_sentences(doc.page_content)):
+                terms = set(tokenize(text))
+                if not terms:
+                    continue
+                duplicate = None
+                for i, (_, _, _, kept_terms) in enumerate(sentences):
+                    if len(terms & kept_terms) / min(len(terms), len(kept_terms)) >= self.duplicate_overlap:
+                        duplicate = i
+                        break
+                if duplicate is None:
+                    sentences.append((rank, position, text, terms))
+                elif len(terms) > len(sentences[duplicate][3]):
+                    sentences[duplicate] = (rank, position, text, terms)
+
+        weights = {term: idf(term) for term in set(tokenize(query))}
+        total = sum(weights.values()) or 1.0
+        def relevance(sentence):
+            return sum(weight for term, weight in weights.items() if term in sentence[3]) / total
+
+        scored = [(relevance(sentence), sentence) for sentence in sentences]
+        candidates = [item for item in scored if item[0] > 0] or scored
+        # Most relevant first; earlier chunks and sentences break ties
+        candidates.sort(key=lambda item: (-item[0], item[1][0], item[1][1]))
+
+        chosen = []
+        used = 0
+        for _, sentence in candidates:
+            tokens = self.tokens.count(sentence[2])
+            if used + tokens <= self.token_budget:
+                chosen.append(sentence)
+                used += tokens
+
+        if not chosen and docs:
+            rank, text = (candidates[0][1][0], candidates[0][1][2]) if candidates else (0, docs[0].page_content)
+            truncated = self.tokens.truncate(text, self.token_budget)
+            if truncated.strip():
+                chosen.append((rank, 0, truncated, None))
+
+        compressed = []
+        for rank, doc in enumerate(docs):
+            kept = sorted((position, text) for r, position, text, _ in chosen if r == rank)
+            if kept:
+                compressed.append(Document(page_content=' '.join(text for _, text in kept), metadata=doc.metadata))
+        tokens_after = sum(self.tokens.count(doc.page_content) for doc in compressed)
+        return compressed, tokens_before, tokens_after
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._cache)
+        stats['tokens_saved'] = stats['tokens_before'] - stats['tokens_after']
+        stats['saved_ratio'] = round(stats['tokens_saved'] / stats['tokens_before'], 4) if stats['tokens_before'] else 0.0
+        stats['avg_ms'] = round(1000 * stats['seconds'] / stats['queries'], 3) if stats['queries'] else 0.0
+        return stats
@@ -0,0 +1,215 @@
+from concurrent.futures import Future
+import asyncio
+import threading
+import uuid
+
+
+class _Entry:
+    __slots__ = ('future', 'deadline', 'expires_at')
+
+    def __init__(self, future, deadline):
+        self.future = future
+        self.deadline = deadline
+        self.expires_at = None
+
+
+class _StreamEntry:
+    """Reorders numbered chunks and hands them out in sequence through a queue"""
+    __slots__ = ('queue', 'pending', 'next_seq', 'deadline')
+
+    def __init__(self, deadline):
+        self.queue = asyncio.Queue()
+        self.pending = {}  # seq -> (chunk, done), chunks that arrived early
+        self.next_seq = 0
+        self.deadline = deadline
+
+
+class QueryCorrelator:
+    """Matches responses arriving at the webhook with the queries that caused them.
+
+    Every in-flight query is an asyncio future on a single event loop running
+    in one background thread, so thousands of pending queries cost a dict
+    entry each rather than a blocked thread. Query ids are random UUIDs. A
+    periodic sweep fails queries that passed their deadline and forgets
+    answered queries nobody collected within `result_ttl`; responses for ids
+    that are no longer known are dropped instead of stored.
+
+    Streamed queries get a _StreamEntry instead: chunks may arrive out of
+    order and are released strictly by sequence number. Their deadline is an
+    idle timeout, pushed back whenever a chunk arrives.
+    """
+
+    def __init__(self, timeout=30.0, result_ttl=300.0, sweep_interval=1.0):
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self.sweep_interval = sweep_interval
+        self._entries = {}  # query_id -> _Entry, only touched on the loop thread
+        self._stats = {'registered': 0, 'answered': 0, 'timed_out': 0, 'late_responses': 0}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="query-correlator", daemon=True)
+        self._thread.start()
+        self._loop.call_soon_threadsafe(self._sweep)
+
+    def _call(self, fn, *args):
+        """Run `fn` on the loop thread and return its result to the calling thread"""
+        result = Future()
+        def run():
+            try:
+                result.set_result(fn(*args))
+            except Exception as e:
+                result.set_exception(e)
+        self._loop.call_soon_threadsafe(run)
+        return result.result()
+
+    def register(self, timeout=None):
+        """Create a new in-flight query and return its id"""
+        query_id = uuid.uuid4().hex
+        self._call(self._register, query_id, self.timeout if timeout is None else timeout)
+        return query_id
+
+    def _register(self, query_id, timeout):
+        self._entries[query_id] = _Entry(self._loop.create_future(), self._loop.time() + timeout)
+        self._stats['registered'] += 1
+
+    def resolve(self, query_id, response):
+        """Deliver a response; returns False if the query is unknown, expired or already answered"""
+        return self._call(self._resolve, query_id, response)
+
+    def _resolve(self, query_id, response):
+        entry = self._entries.get(query_id)
+        if not isinstance(entry, _Entry) or entry.future.done():
+            self._stats['late_responses'] += 1
+            return False
+        entry.future.set_result(response)
+        entry.expires_at = self._loop.time() + self.result_ttl
+        self._stats['answered'] += 1
+        return True
+
+    def wait(self, query_id, timeout):
+        """Block the caller until the query is answered or `timeout` elapses.
+
+        Returns a (status, response) pair where status is 'done', 'pending'
+        or 'unknown'. A 'done' result is consumed and forgotten.
+        """
+        return asyncio.run_coroutine_threadsafe(self._wait(query_id, timeout), self._loop).result()
+
+    async def _wait(self, query_id, timeout):
+        entry = self._entries.get(query_id)
+        if not isinstance(entry, _Entry):
+            return 'unknown', None
+        try:
+            # Shielded so a wait timing out does not cancel the query itself
+            response = await asyncio.wait_for(asyncio.shield(entry.future), timeout)
+        except asyncio.TimeoutError:
+            return 'pending', None
+        except asyncio.CancelledError:
+            # Timed out by the sweep or discarded while we were waiting
+            return 'unknown', None
+        self._entries.pop(query_id, None)
+        return 'done', response
+
+    def poll(self, query_id):
+        """Non-blocking check, same return values as `wait`"""
+        return self._call(self._poll, query_id)
+
+    def _poll(self, query_id):
+        entry = self._entries.get(query_id)
+        if not isinstance(entry, _Entry):
+            return 'unknown', None
+        if not entry.future.done():
+            return 'pending', None
+        del self._entries[query_id]
+        return 'done', entry.future.result()
+
+    def discard(self, query_id):
+        """Forget a query, e.g. after giving up on it; later responses are dropped"""
+        self._call(self._discard, query_id)
+
+    def _discard(self, query_id):
+        entry = self._entries.pop(query_id, None)
+        if isinstance(entry, _Entry) and not entry.future.done():
+            entry.future.cancel()
+        elif isinstance(entry, _StreamEntry):
+            entry.queue.put_nowait(None)
+
+    def register_stream(self, timeout=None):
+        """Create a streamed query; returns (query_id, queue), the queue being read back with `iter_stream`.
+
+        The queue is handed out here, before the query is sent, because a
+        fast final chunk removes the entry before the reader starts.
+        """
+        query_id = uuid.uuid4().hex
+        queue = self._call(self._register_stream, query_id, self.timeout if timeout is None else timeout)
+        return query_id, queue
+
+    def _register_stream(self, query_id, timeout):
+        entry = _StreamEntry(self._loop.time() + timeout)
+        self._entries[query_id] = entry
+        self._stats['registered'] += 1
+        return entry.queue
+
+    def push_chunk(self, query_id, seq, chunk, done):
+        """Deliver one numbered chunk; returns False if the stream is unknown or expired"""
+        return self._call(self._push_chunk, query_id, seq, chunk, done)
+
+    def _push_chunk(self, query_id, seq, chunk, done):
+        entry = self._entries.get(query_id)
+        if not isinstance(entry, _StreamEntry) or seq < entry.next_seq:
+            self._stats['late_responses'] += 1
+            return False
+        entry.pending[seq] = (chunk, done)
+        entry.deadline = self._loop.time() + self.timeout
+        while entry.next_seq in entry.pending:
+            chunk, done = entry.pending.pop(entry.next_seq)
+            entry.queue.put_nowait((entry.next_seq, chunk, done))
+            entry.next_seq += 1
+            if done:
+                # The reader still holds the queue; nothing later is accepted
+                del self._entries[query_id]
+                self._stats['answered'] += 1
+                break
+        return True
+
+    def iter_stream(self, queue):
+        """Yield (seq, chunk, done) in order from a queue returned by `register_stream`.
+
+        Stops after the final chunk, or early if the stream times out; in
+        that case the last item yielded is not marked done.
+        """
+        while True:
+            item = asyncio.run_coroutine_threadsafe(queue.get(), self._loop).result()
+            if item is None:
+                return
+            yield item
+            if item[2]:
+                return
+
+    def _sweep(self):
+        now = self._loop.time()
+        for query_id, entry in list(self._entries.items()):
+            if isinstance(entry, _StreamEntry):
+                if now >= entry.deadline:
+                    entry.queue.put_nowait(None)  # Ends the reader's iteration
+                    del self._entries[query_id]
+                    self._stats['timed_out'] += 1
+            elif not entry.future.done():
+                if now >= entry.deadline:
+                    # Wakes any waiter, which then reports the query as unknown
+                    entry.future.cancel()
+                    del self._entries[query_id]
+                    self._stats['timed_out'] += 1
+            elif entry.expires_at is not None and now >= entry.expires_at:
+                del self._entries[query_id]
+        self._loop.call_later(self.sweep_interval, self._sweep)
+
+    def stats(self):
+        return self._call(self._stats_snapshot)
+
+    def _stats_snapshot(self):
+        stats = dict(self._stats)
+        stats['in_flight'] = sum(
+            1 for entry in self._entries.values()
+            if isinstance(entry, _StreamEntry) or not entry.future.done()
+        )
+        stats['uncollected'] = len(self._entries) - stats['in_flight']
+        return stats
@@ -0,0 +1,119 @@
+from contextlib import contextmanager
+from ingest import iter_pdf_paths
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def documents_fingerprint(path):
+    """Cheap change marker for a PDF or directory of PDFs: names, sizes and modification times"""
+    fingerprint = []
+    for pdf_path in iter_pdf_paths(path):
+        try:
+            stat = os.stat(pdf_path)
+        except FileNotFoundError:
+            continue
+        fingerprint.append((pdf_path, stat.st_size, stat.st_mtime_ns))
+    return fingerprint
+
+
+class Generation:
+    """One servable version of the index: the vector index and the retriever built over it"""
+
+    def __init__(self, index, hybrid):
+        self.index = index
+        self.hybrid = hybrid
+        self.version = index.version
+        self.refs = 0
+        self.retired = False
+
+    def close(self):
+        """Drop the index and retriever so their memory (and any mapped files) can be released"""
+        self.index = None
+        self.hybrid = None
+        logger.info(f"Released index generation {self.version[:12]}")
+
+
+class Generations:
+    """Holds the current Generation and swaps in new ones without blocking queries.
+
+    Queries take the current generation with `current()` and keep using it
+    until they finish, even if a newer one is swapped in meanwhile. A
+    replaced generation is closed once its last query has released it.
+    """
+
+    def __init__(self, generation):
+        self._current = generation
+        self._lock = threading.Lock()
+        self.swaps = 0
+
+    @property
+    def version(self):
+        return self._current.version
+
+    @contextmanager
+    def current(self):
+        with self._lock:
+            generation = self._current
+            generation.refs += 1
+        try:
+            yield generation
+        finally:
+            self._release(generation)
+
+    def swap(self, generation):
+        """Make `generation` current; the old one closes when its in-flight queries finish"""
+        with self._lock:
+            old, self._current = self._current, generation
+            old.retired = True
+            self.swaps += 1
+            idle = old.refs == 0
+        logger.info(
+            f"Swapped index generation {old.version[:12]} -> {generation.version[:12]}"
+            + ("" if idle else f", {old.refs} queries still on the old one")
+        )
+        if idle:
+            old.close()
+        return old
+
+    def _release(self, generation):
+        with self._lock:
+            generation.refs -= 1
+            idle = generation.retired and generation.refs == 0
+        if idle:
+            generation.close()
+
+
+class PollingWatcher:
+    """Daemon thread that calls `on_change` whenever `fingerprint()` returns something new.
+
+    The fingerprint is taken every `interval` seconds. If `on_change` raises,
+    the change is not acknowledged and is retried on the next poll. Pass
+    `initial` (taken before the first build) so changes made during that
+    build are not missed.
+    """
+
+    def __init__(self, fingerprint, on_change, interval=5.0, name="watcher", initial=None):
+        self.fingerprint = fingerprint
+        self.on_change = on_change
+        self.interval = interval
+        self._last = fingerprint() if initial is None else initial
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                fingerprint = self.fingerprint()
+                if fingerprint == self._last:
+                    continue
+                started = time.perf_counter()
+                self.on_change()
+                self._last = fingerprint
+                logger.info(f"{self._thread.name} handled a change in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                logger.error(f"{self._thread.name} failed to handle a change: {e}")
@@ -0,0 +1,149 @@
+from collections import Counter, defaultdict
+import logging
+import math
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Keeps identifiers such as "h_t", "Bi-LSTM" and "W_xh" whole
+_TOKEN = re.compile(r"[a-z0-9]+(?:[_\-'][a-z0-9]+)*")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring over the store's chunks"""
+
+    def __init__(self, entries, k1=1.5, b=0.75):
+        """`entries` is a list of (id, Document) pairs"""
+        self.k1 = k1
+        self.b = b
+        self.entries = entries
+        self.postings = defaultdict(list)  # term -> [(entry index, term frequency)]
+        self.lengths = []
+        for i, (_, doc) in enumerate(entries):
+            terms = tokenize(doc.page_content)
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((i, tf))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.entries) - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k):
+        """Top-k (id, Document) pairs for the query's terms"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf(term)
+            for i, tf in self.postings.get(term, ()):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [self.entries[i] for i in best]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked lists of (id, Document) pairs; best first"""
+    scores = defaultdict(float)
+    docs = {}
+    for ranking in rankings:
+        for rank, (entry_id, doc) in enumerate(ranking):
+            scores[entry_id] += 1.0 / (k + rank + 1)
+            docs[entry_id] = doc
+    return [(entry_id, docs[entry_id]) for entry_id in sorted(scores, key=scores.get, reverse=True)]
+
+
+class LexicalReranker:
+    """Cheap reranker: IDF-weighted share of the query's terms each chunk contains.
+
+    Fusion order breaks ties, so the reranker only reorders chunks whose
+    query coverage actually differs.
+    """
+
+    def __init__(self, bm25):
+        self.bm25 = bm25
+
+    def rerank(self, query, candidates):
+        terms = set(tokenize(query))
+        weights = {term: self.bm25.idf(term) for term in terms}
+        total = sum(weights.values()) or 1.0
+        def coverage(item):
+            chunk_terms = set(tokenize(item[1][1].page_content))
+            return sum(weight for term, weight in weights.items() if term in chunk_terms) / total
+        return [candidate for _, candidate in sorted(enumerate(candidates), key=lambda item: (-coverage(item), item[0]))]
+
+
+class CrossEncoderReranker:
+    """Reranks with a local sentence-transformers cross-encoder"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name)
+
+    def rerank(self, query, candidates):
+        scores = self.model.predict([(query, doc.page_content) for _, doc in candidates])
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        return [candidates[i] for i in order]
+
+
+class HybridRetriever:
+    """Dense + BM25 retrieval fused by reciprocal rank fusion, then reranked.
+
+    Each retriever contributes its top `candidates`; the fused list is
+    reranked and cut to `k`, so the prompt stays small while exact-term
+    matches the embeddings miss still make it in. The BM25 index is rebuilt
+    from the store whenever the index version changes, unless the index
+    ships a prebuilt one (see mmap_index.MmapBM25Index). `reranker` is
+    'lexical', 'none', or the name of a cross-encoder model.
+    """
+
+    def __init__(self, index, k=3, candidates=20, reranker='lexical', rrf_k=60):
+        self.index = index
+        self.k = k
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reranker_name = reranker
+        self._reranker = CrossEncoderReranker(reranker) if reranker not in ('lexical', 'none') else None
+        self._bm25 = None
+        self._bm25_version = None
+        self._lock = threading.Lock()
+
+    def bm25(self):
+        version = self.index.version
+        with self._lock:
+            if self._bm25_version != version:
+                started = time.perf_counter()
+                prebuilt = self.index.bm25_index() if hasattr(self.index, 'bm25_index') else None
+                self._bm25 = prebuilt if prebuilt is not None else BM25Index(self.index.all_entries())
+                self._bm25_version = version
+                logger.info(
+                    f"{'Opened' if prebuilt is not None else 'Built'} BM25 index over {len(self._bm25)} chunks "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            return self._bm25
+
+    def search(self, query, query_embedding):
+        return self.search_many([query], [query_embedding])[0]
+
+    def search_many(self, queries, query_embeddings):
+        """Fused, reranked top-k Documents for each query; dense search is one store round trip"""
+        bm25 = self.bm25()
+        dense = self.index.search_entries_by_vectors(query_embeddings, k=self.candidates)
+        results = []
+        for query, dense_ranking in zip(queries, dense):
+            fused = reciprocal_rank_fusion([dense_ranking, bm25.search(query, self.candidates)], k=self.rrf_k)
+            if self._reranker is not None:
+                fused = self._reranker.rerank(query, fused)
+            elif self.reranker_name == 'lexical':
+                fused = LexicalReranker(bm25).rerank(query, fused)
+            results.append([doc for _, doc in fused[:self.k]])
+        return results
@@ -0,0 +1,135 @@
+from langchain.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
+from vector_index import file_sha256
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def iter_pdf_paths(path):
+    """Yield a single PDF, or every PDF under a directory in a stable order"""
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.pdf'):
+                yield os.path.join(root, name)
+
+
+class IngestionPipeline:
+    """Streams PDFs into a PersistentVectorIndex as batches of overlapping chunks.
+
+    Pages are read lazily and split as they arrive; chunks are embedded in
+    batches by a bounded pool of workers and each finished batch is written
+    straight to the store, so memory stays flat regardless of corpus size.
+    """
+
+    def __init__(self, index, chunk_size=1000, chunk_overlap=200, batch_size=64, max_workers=4):
+        self.index = index
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def ingest(self, path):
+        """Ingest a PDF or a directory of PDFs and return a throughput report"""
+        stats = {'files': 0, 'files_skipped': 0, 'pages': 0, 'chunks': 0, 'chunks_embedded': 0, 'chunks_removed': 0}
+        started = time.perf_counter()
+
+        seen_sources = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for pdf_path in iter_pdf_paths(path):
+                seen_sources.add(os.path.abspath(pdf_path))
+                self._ingest_pdf(pdf_path, executor, stats)
+
+        # PDFs deleted from an ingested directory take their chunks with them
+        if os.path.isdir(path):
+            root = os.path.join(os.path.abspath(path), '')
+            for source in self.index.sources():
+                if source.startswith(root) and source not in seen_sources:
+                    stats['chunks_removed'] += self.index.forget_source(source)
+
+        elapsed = time.perf_counter() - started
+        stats['seconds'] = round(elapsed, 3)
+        stats['pages_per_sec'] = round(stats['pages'] / elapsed, 2) if elapsed else 0.0
+        stats['chunks_per_sec'] = round(stats['chunks'] / elapsed, 2) if elapsed else 0.0
+        logger.info(
+            f"Ingested {stats['files']} PDFs ({stats['files_skipped']} unchanged) in {stats['seconds']}s: "
+            f"{stats['pages']} pages ({stats['pages_per_sec']} pages/sec), "
+            f"{stats['chunks']} chunks ({stats['chunks_per_sec']} chunks/sec), "
+            f"{stats['chunks_embedded']} embedded, {stats['chunks_removed']} removed"
+        )
+        return stats
+
+    def _ingest_pdf(self, pdf_path, executor, stats):
+        source = os.path.abspath(pdf_path)
+        file_hash = file_sha256(source)
+        entry = self.index.source_entry(source)
+        stats['files'] += 1
+
+        if entry and entry['sha256'] == file_hash:
+            logger.info(f"Index for {pdf_path} is up to date, skipping")
+            stats['files_skipped'] += 1
+            return
+
+        logger.info(f"Ingesting {pdf_path}")
+        previous_ids = set(entry['ids']) if entry else set()
+        current_ids = []
+        seen_ids = set()
+        batch = []
+        in_flight = set()
+
+        for page in PyPDFLoader(pdf_path).lazy_load():
+            stats['pages'] += 1
+            for chunk_number, text in enumerate(self.splitter.split_text(page.page_content)):
+                stats['chunks'] += 1
+                chunk_id = self.index.text_id(source, text)
+                if chunk_id in seen_ids:
+                    continue
+                seen_ids.add(chunk_id)
+                current_ids.append(chunk_id)
+                if chunk_id in previous_ids:
+                    continue
+
+                batch.append((chunk_id, text, {**page.metadata, 'chunk': chunk_number}))
+                if len(batch) >= self.batch_size:
+                    in_flight.add(executor.submit(self._embed_batch, batch))
+                    batch = []
+                    # Backpressure: never hold more than one batch per worker
+                    # in memory waiting to be embedded or written
+                    if len(in_flight) >= self.max_workers:
+                        in_flight = self._drain(in_flight, stats, FIRST_COMPLETED)
+
+        if batch:
+            in_flight.add(executor.submit(self._embed_batch, batch))
+        self._drain(in_flight, stats)
+
+        stale_ids = list(previous_ids - seen_ids)
+        if stale_ids:
+            self.index.delete(stale_ids)
+            stats['chunks_removed'] += len(stale_ids)
+
+        # Recorded last, so an interrupted ingest is retried on the next run
+        self.index.record_source(source, file_hash, current_ids)
+
+    def _embed_batch(self, batch):
+        texts = [text for _, text, _ in batch]
+        return batch, self.index.embeddings.embed_documents(texts)
+
+    def _drain(self, in_flight, stats, return_when=ALL_COMPLETED):
+        """Write finished batches to the store and return the ones still running"""
+        done, pending = wait(in_flight, return_when=return_when)
+        for future in done:
+            batch, vectors = future.result()
+            self.index.add_embeddings(
+                [chunk_id for chunk_id, _, _ in batch],
+                [text for _, text, _ in batch],
+                vectors,
+                [metadata for _, _, metadata in batch]
+            )
+            stats['chunks_embedded'] += len(batch)
+        return pending
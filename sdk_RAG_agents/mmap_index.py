@@ -0,0 +1,269 @@
+from collections import Counter, defaultdict
+from langchain.schema import Document
+from hybrid import tokenize
+import json
+import logging
+import math
+import numpy as np
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the snapshot layout changes, so older snapshots are re-exported
+SNAPSHOT_FORMAT = 2
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def export_snapshot(index, snapshot_root):
+    """Write the store's current contents as a read-only snapshot and return its directory.
+
+    Snapshots live in `snapshot_root/<index version>/`, so an unchanged index
+    is exported once. Besides vectors and entries, a snapshot holds the BM25
+    inverted index as flat arrays, so serving processes map it instead of
+    building their own. The directory is written under a temporary name and
+    renamed into place, then `snapshot_root/CURRENT` is pointed at it.
+    """
+    version = index.version
+    out_dir = os.path.join(snapshot_root, version)
+    if _snapshot_format(out_dir) != SNAPSHOT_FORMAT:
+        started = time.perf_counter()
+        tmp_dir = f"{out_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        result = index.vector_store._collection.get(include=['embeddings', 'documents', 'metadatas'])
+        vectors = np.asarray(result['embeddings'], dtype=np.float32)
+        if not len(result['ids']):
+            vectors = vectors.reshape(0, 0)
+        # Unit rows so cosine similarity is a plain dot product
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.save(os.path.join(tmp_dir, 'vectors.npy'), vectors / np.maximum(norms, 1e-12))
+
+        offsets = [0]
+        with open(os.path.join(tmp_dir, 'entries.bin'), 'wb') as f:
+            for entry_id, text, metadata in zip(result['ids'], result['documents'], result['metadatas']):
+                record = json.dumps({'id': entry_id, 'text': text, 'metadata': metadata or {}}).encode('utf-8')
+                f.write(record)
+                offsets.append(offsets[-1] + len(record))
+        np.save(os.path.join(tmp_dir, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+        avg_length = _write_bm25(tmp_dir, result['documents'])
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({
+                'format': SNAPSHOT_FORMAT,
+                'version': version,
+                'model': index.model_name,
+                'count': len(result['ids']),
+                'bm25': {'k1': BM25_K1, 'b': BM25_B, 'avg_length': avg_length}
+            }, f)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp_dir, out_dir)
+        logger.info(f"Exported {len(result['ids'])} entries to {out_dir} in {time.perf_counter() - started:.2f}s")
+
+    current_tmp = os.path.join(snapshot_root, 'CURRENT.tmp')
+    with open(current_tmp, 'w') as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(snapshot_root, 'CURRENT'))
+    return out_dir
+
+
+def _snapshot_format(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, 'meta.json')) as f:
+            return json.load(f).get('format', 1)
+    except FileNotFoundError:
+        return None
+
+
+def _write_bm25(out_dir, texts):
+    """Write the BM25 inverted index of `texts` as arrays; returns the average document length.
+
+    Terms are stored sorted by their UTF-8 bytes in `terms.bin` with
+    `term_offsets.npy`, so a term is found by binary search. Term t's
+    postings are `posting_docs[posting_offsets[t]:posting_offsets[t + 1]]`
+    with matching `posting_tfs`; `idf.npy` and `doc_lengths.npy` complete it.
+    """
+    postings = defaultdict(list)  # term -> [(entry index, term frequency)]
+    lengths = []
+    for i, text in enumerate(texts):
+        terms = tokenize(text)
+        lengths.append(len(terms))
+        for term, tf in Counter(terms).items():
+            postings[term].append((i, tf))
+
+    vocabulary = sorted(postings, key=lambda term: term.encode('utf-8'))
+    term_offsets = [0]
+    posting_offsets = [0]
+    docs = []
+    tfs = []
+    idf = []
+    with open(os.path.join(out_dir, 'terms.bin'), 'wb') as f:
+        for term in vocabulary:
+            encoded = term.encode('utf-8')
+            f.write(encoded)
+            term_offsets.append(term_offsets[-1] + len(encoded))
+            for i, tf in postings[term]:
+                docs.append(i)
+                tfs.append(tf)
+            posting_offsets.append(len(docs))
+            df = len(postings[term])
+            idf.append(math.log(1 + (len(texts) - df + 0.5) / (df + 0.5)))
+
+    np.save(os.path.join(out_dir, 'term_offsets.npy'), np.asarray(term_offsets, dtype=np.int64))
+    np.save(os.path.join(out_dir, 'posting_offsets.npy'), np.asarray(posting_offsets, dtype=np.int64))
+    np.save(os.path.join(out_dir, 'posting_docs.npy'), np.asarray(docs, dtype=np.int32))
+    np.save(os.path.join(out_dir, 'posting_tfs.npy'), np.asarray(tfs, dtype=np.float32))
+    np.save(os.path.join(out_dir, 'idf.npy'), np.asarray(idf, dtype=np.float64))
+    np.save(os.path.join(out_dir, 'doc_lengths.npy'), np.asarray(lengths, dtype=np.float32))
+    return sum(lengths) / len(lengths) if lengths else 0.0
+
+
+def current_snapshot(snapshot_root):
+    """Directory of the snapshot CURRENT points at"""
+    with open(os.path.join(snapshot_root, 'CURRENT')) as f:
+        return os.path.join(snapshot_root, f.read().strip())
+
+
+def prune_snapshots(snapshot_root, keep):
+    """Delete snapshot directories other than those in `keep`.
+
+    Processes that still map a deleted snapshot keep reading it; the files
+    are only freed once they unmap them.
+    """
+    keep = {os.path.abspath(path) for path in keep if path}
+    for name in os.listdir(snapshot_root):
+        path = os.path.join(snapshot_root, name)
+        if os.path.isdir(path) and not name.endswith('.tmp') and os.path.abspath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Removed old snapshot {path}")
+
+
+class MmapVectorIndex:
+    """Read-only vector index over a snapshot written by `export_snapshot`.
+
+    Vectors and entries are memory-mapped, so opening one takes milliseconds
+    and every process serving the same snapshot shares a single copy through
+    the page cache. Search is an exact dot product over the mapped vectors.
+    Offers the read side of PersistentVectorIndex.
+    """
+
+    def __init__(self, snapshot_dir):
+        with open(os.path.join(snapshot_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        self.snapshot_dir = snapshot_dir
+        self.version = meta['version']
+        self.model_name = meta['model']
+        self.vectors = np.load(os.path.join(snapshot_dir, 'vectors.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(snapshot_dir, 'offsets.npy'), mmap_mode='r')
+        self._entries = np.memmap(os.path.join(snapshot_dir, 'entries.bin'), dtype=np.uint8, mode='r') \
+            if meta['count'] else np.zeros(0, dtype=np.uint8)
+        self._bm25 = MmapBM25Index(snapshot_dir, meta['bm25'], self.entry) if 'bm25' in meta else None
+
+    def bm25_index(self):
+        """The snapshot's mapped BM25 index, or None for snapshots written without one"""
+        return self._bm25
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def entry(self, i):
+        record = json.loads(self._entries[self.offsets[i]:self.offsets[i + 1]].tobytes())
+        return record['id'], Document(page_content=record['text'], metadata=record['metadata'])
+
+    def all_entries(self):
+        return [self.entry(i) for i in range(len(self))]
+
+    def search_entries_by_vectors(self, embeddings, k=4):
+        """Nearest entries for several query vectors as (id, Document) pairs, best first"""
+        if not len(self):
+            return [[] for _ in embeddings]
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ self.vectors.T
+        k = min(k, len(self))
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            results.append([self.entry(int(i)) for i in top[np.argsort(-row[top])]])
+        return results
+
+    def search_by_vectors(self, embeddings, k=4):
+        return [[doc for _, doc in entries] for entries in self.search_entries_by_vectors(embeddings, k)]
+
+
+class MmapBM25Index:
+    """BM25 search over the inverted index `export_snapshot` writes next to the vectors.
+
+    Offers the interface of hybrid.BM25Index. Postings are memory-mapped and
+    only the top hits' texts are decoded (through `entry`), so opening one
+    costs no parsing and no per-process copy of the corpus.
+    """
+
+    def __init__(self, snapshot_dir, params, entry):
+        def load(name):
+            return np.load(os.path.join(snapshot_dir, name), mmap_mode='r')
+        self.k1 = params['k1']
+        self.b = params['b']
+        self.avg_length = params['avg_length']
+        self.entry = entry
+        self.term_offsets = load('term_offsets.npy')
+        self.posting_offsets = load('posting_offsets.npy')
+        self.posting_docs = load('posting_docs.npy')
+        self.posting_tfs = load('posting_tfs.npy')
+        self.idfs = load('idf.npy')
+        self.lengths = load('doc_lengths.npy')
+        terms_path = os.path.join(snapshot_dir, 'terms.bin')
+        self._terms = np.memmap(terms_path, dtype=np.uint8, mode='r') \
+            if os.path.getsize(terms_path) else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def _term_id(self, term):
+        """Binary search of the sorted vocabulary; None if the term is not indexed"""
+        key = term.encode('utf-8')
+        lo, hi = 0, len(self.term_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self._terms[self.term_offsets[mid]:self.term_offsets[mid + 1]].tobytes()
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def idf(self, term):
+        term_id = self._term_id(term)
+        if term_id is not None:
+            return float(self.idfs[term_id])
+        # Same value BM25Index gives a term no chunk contains
+        return math.log(1 + (len(self) + 0.5) / 0.5)
+
+    def search(self, query, k):
+        """Top-k (id, Document) pairs for the query's terms"""
+        docs = []
+        contributions = []
+        for term in set(tokenize(query)):
+            term_id = self._term_id(term)
+            if term_id is None:
+                continue
+            start, end = self.posting_offsets[term_id], self.posting_offsets[term_id + 1]
+            term_docs = np.asarray(self.posting_docs[start:end])
+            tfs = np.asarray(self.posting_tfs[start:end])
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[term_docs] / self.avg_length)
+            docs.append(term_docs)
+            contributions.append(self.idfs[term_id] * tfs * (self.k1 + 1) / (tfs + norm))
+        if not docs:
+            return []
+        hit_docs, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        k = min(k, len(hit_docs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        # Equal scores go to the earlier chunk
+        order = top[np.lexsort((hit_docs[top], -scores[top]))]
+        return [self.entry(int(hit_docs[i])) for i in order]
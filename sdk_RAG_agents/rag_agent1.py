@@ -3,14 +3,26 @@ from flask_cors import CORS
 from fetchai.crypto import Identity
 from fetchai.registration import register_with_agentverse
 from fetchai.communication import parse_message_from_agent, send_message_to_agent
-from langchain_openai import OpenAIEmbeddings, OpenAI
-from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA
-from langchain.document_loaders import PyPDFLoader
+from langchain.chains.question_answering import load_qa_chain
+from mmap_index import MmapVectorIndex, export_snapshot, current_snapshot, prune_snapshots
+from hot_reload import Generation, Generations, PollingWatcher, documents_fingerprint
+from vector_index import PersistentVectorIndex
+from ingest import IngestionPipeline
+from answer_cache import AnswerCache, normalize_query
+from hybrid import HybridRetriever
+from compression import ContextCompressor
+from backends import make_embeddings, make_llm
+from worker_pool import WorkerPool, QueueFullError
 import logging
 import os
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import socket
 import sys
+import threading
+import time
+from werkzeug.serving import make_server
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -22,58 +34,340 @@ CORS(app)
 # Initialising client identity
 client_identity = None
 
+def build_index(pdf_path, embeddings, embedding_model, index=None):
+    """Bring the on-disk index up to date with a PDF or directory; returns (index, ingest report)"""
+    # Vectors persist on disk keyed by PDF contents and embedding model,
+    # so a restart with an unchanged PDF makes no embedding calls
+    if index is None:
+        index = PersistentVectorIndex(
+            embeddings,
+            embedding_model,
+            os.getenv("RAG_INDEX_DIR", ".rag_index")
+        )
+    pipeline = IngestionPipeline(
+        index,
+        chunk_size=int(os.getenv("RAG_CHUNK_SIZE", "1000")),
+        chunk_overlap=int(os.getenv("RAG_CHUNK_OVERLAP", "200")),
+        batch_size=int(os.getenv("RAG_EMBED_BATCH_SIZE", "64")),
+        max_workers=int(os.getenv("RAG_EMBED_WORKERS", "4"))
+    )
+    report = pipeline.ingest(pdf_path)
+    logger.info("PDF processed and stored in vector store")
+    return index, report
+
+def snapshot_root():
+    return os.getenv("RAG_SNAPSHOT_DIR", os.path.join(os.getenv("RAG_INDEX_DIR", ".rag_index"), "snapshots"))
+
+class SnapshotBuilder:
+    """Ingests the documents into the persistent index and exports the result as a snapshot.
+
+    Each build only embeds what changed since the last one. The snapshot
+    being replaced is kept until the next build, so processes still
+    switching away from it never see its files disappear.
+    """
+
+    def __init__(self, pdf_path, embeddings, embedding_model, root):
+        self.pdf_path = pdf_path
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.root = root
+        self.index = None
+        self._current = None
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        """Ingest and export; returns the snapshot directory, which CURRENT now points at"""
+        with self._lock:
+            self.index, _ = build_index(self.pdf_path, self.embeddings, self.embedding_model, self.index)
+            snapshot_dir = export_snapshot(self.index, self.root)
+            if snapshot_dir != self._current:
+                self._previous, self._current = self._current, snapshot_dir
+            prune_snapshots(self.root, keep={self._current, self._previous})
+            return snapshot_dir
+
 class RAGProcessor:
-    def __init__(self, pdf_path):
-        """Initialize RAG processor with PDF path"""
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not self.openai_api_key:
-            raise ValueError("Missing OpenAI API Key")
-        
-        logger.info(f"Loading PDF from {pdf_path}")
-        loader = PyPDFLoader(pdf_path)
-        pages = loader.load()
+    def __init__(self, pdf_path=None, snapshot_dir=None, embeddings=None, embedding_model=None):
+        """Initialize RAG processor with a PDF or a directory of PDFs.
+
+        With `snapshot_dir` nothing is ingested: the processor serves a
+        read-only, memory-mapped snapshot written by mmap_index.export_snapshot,
+        and can be moved to a newer one with `swap_snapshot`.
+        """
+        # 'openai', 'local' (CPU models) or 'fake' (deterministic, for offline benchmarks)
+        if embeddings is None:
+            embeddings, embedding_model = make_embeddings(os.getenv("RAG_EMBEDDINGS", "openai"))
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+
+        if snapshot_dir is not None:
+            index = self._open_snapshot(snapshot_dir)
+            self.ingest_report = None
+        else:
+            index, self.ingest_report = build_index(pdf_path, self.embeddings, embedding_model)
         
-        self.embeddings = OpenAIEmbeddings()
-        self.vector_store = Chroma(
-            collection_name="rag_store",
-            embedding_function=self.embeddings
+        self.llm = make_llm(os.getenv("RAG_LLM", "openai"))
+
+        # Built once; queries reuse the chain instead of rebuilding it per
+        # request. Retrieval happens before the chain (see HybridRetriever)
+        self.qa_chain = load_qa_chain(self.llm, chain_type="stuff")
+        self.answer_cache = AnswerCache(
+            similarity_threshold=float(os.getenv("RAG_CACHE_SIMILARITY", "0.95")),
+            max_entries=int(os.getenv("RAG_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("RAG_CACHE_TTL", "3600"))
         )
-        
-        # Store PDF content in vector store
-        texts = [page.page_content for page in pages]
-        self.vector_store.add_texts(texts)
-        logger.info("PDF processed and stored in vector store")
-        
-        self.llm = OpenAI()
-        
+        # Retrieved chunks are cut to the most relevant sentences under a
+        # hard prompt token budget; 0 sends whole chunks
+        token_budget = int(os.getenv("RAG_CONTEXT_TOKENS", "512"))
+        self.compressor = ContextCompressor(
+            token_budget,
+            duplicate_overlap=float(os.getenv("RAG_CONTEXT_DUPLICATE_OVERLAP", "0.8")),
+            max_entries=int(os.getenv("RAG_CONTEXT_CACHE_SIZE", "1024"))
+        ) if token_budget > 0 else None
+        # Shared by batch queries so their LLM generations overlap
+        self.llm_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("RAG_LLM_CONCURRENCY", "8")),
+            thread_name_prefix="rag-llm"
+        )
+        # Queries pin the generation they started on, so a swap never
+        # changes the index under a running query
+        self.generations = Generations(self._generation(index))
+
+    def _open_snapshot(self, snapshot_dir):
+        index = MmapVectorIndex(snapshot_dir)
+        if index.model_name != self.embedding_model:
+            raise ValueError(f"Snapshot was built with {index.model_name}, not {self.embedding_model}")
+        logger.info(f"Opened {len(index)} entries from snapshot {snapshot_dir}")
+        return index
+
+    def _generation(self, index):
+        # Dense and BM25 candidates fused and reranked down to a small k
+        hybrid = HybridRetriever(
+            index,
+            k=int(os.getenv("RAG_RETRIEVAL_K", "3")),
+            candidates=int(os.getenv("RAG_CANDIDATE_K", "20")),
+            reranker=os.getenv("RAG_RERANKER", "lexical")
+        )
+        # Opened (snapshots ship their BM25 index) or built before the swap,
+        # so the first query on a new generation is not slowed down
+        hybrid.bm25()
+        return Generation(index, hybrid)
+
+    def swap_snapshot(self, snapshot_dir):
+        """Serve `snapshot_dir` from now on; returns False if it holds the version already served"""
+        index = self._open_snapshot(snapshot_dir)
+        if index.version == self.generations.version:
+            return False
+        generation = self._generation(index)
+        self.answer_cache.replace_version(self.generations.version, generation.version)
+        self.generations.swap(generation)
+        return True
+
     def process_query(self, query):
         """Process a query using RAG"""
-        try:
-            retriever = self.vector_store.as_retriever()
-            qa_chain = RetrievalQA.from_chain_type(
-                self.llm,
-                retriever=retriever
-            )
-            response = qa_chain.run(query)
-            return response
-        except Exception as e:
-            logger.error(f"Error processing query: {str(e)}")
-            return f"Error processing query: {str(e)}"
+        with self.generations.current() as generation:
+            try:
+                version = generation.version
+                response = self.answer_cache.get_exact(query, version)
+                if response is not None:
+                    return response
+
+                query_embedding = self.embeddings.embed_query(query)
+                response = self.answer_cache.get_similar(query_embedding, version)
+                if response is not None:
+                    return response
+
+                # Retrieve with the embedding we already have rather than letting
+                # the chain embed the query a second time
+                started = time.perf_counter()
+                docs = generation.hybrid.search(query, query_embedding)
+                return self._generate(generation, query, query_embedding, docs, started)
+            except Exception as e:
+                logger.error(f"Error processing query: {str(e)}")
+                return f"Error processing query: {str(e)}"
+
+    def process_queries(self, queries):
+        """Process a batch of queries, returning answers in the same order.
+
+        Cache misses are embedded in one embeddings call and searched in one
+        vector store call; their LLM generations then run concurrently.
+        Repeated questions within the batch are answered once.
+        """
+        with self.generations.current() as generation:
+            version = generation.version
+            answers = [None] * len(queries)
+
+            # Group identical questions so each is looked up and generated once
+            positions = {}
+            for i, query in enumerate(queries):
+                positions.setdefault(normalize_query(query), []).append(i)
+
+            def answer(key, response):
+                for i in positions[key]:
+                    answers[i] = response
+
+            misses = []
+            for key, indices in positions.items():
+                response = self.answer_cache.get_exact(queries[indices[0]], version)
+                if response is not None:
+                    answer(key, response)
+                else:
+                    misses.append(key)
+            if not misses:
+                return answers
+
+            try:
+                started = time.perf_counter()
+                miss_queries = [queries[positions[key][0]] for key in misses]
+                query_embeddings = self.embeddings.embed_documents(miss_queries)
+
+                to_generate = []
+                for key, query, query_embedding in zip(misses, miss_queries, query_embeddings):
+                    response = self.answer_cache.get_similar(query_embedding, version)
+                    if response is not None:
+                        answer(key, response)
+                    else:
+                        to_generate.append((key, query, query_embedding))
+
+                if to_generate:
+                    all_docs = generation.hybrid.search_many(
+                        [query for _, query, _ in to_generate],
+                        [query_embedding for _, _, query_embedding in to_generate]
+                    )
+                    futures = {
+                        self.llm_executor.submit(self._generate, generation, query, query_embedding, docs, started): key
+                        for (key, query, query_embedding), docs in zip(to_generate, all_docs)
+                    }
+                    for future, key in futures.items():
+                        try:
+                            answer(key, future.result())
+                        except Exception as e:
+                            logger.error(f"Error processing query: {str(e)}")
+                            answer(key, f"Error processing query: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error processing query batch: {str(e)}")
+                for key in misses:
+                    if answers[positions[key][0]] is None:
+                        answer(key, f"Error processing query: {str(e)}")
+            return answers
+
+    def stream_query(self, query):
+        """Process a query using RAG, yielding the answer in pieces as it is generated"""
+        with self.generations.current() as generation:
+            version = generation.version
+            response = self.answer_cache.get_exact(query, version)
+            if response is not None:
+                yield response
+                return
+
+            query_embedding = self.embeddings.embed_query(query)
+            response = self.answer_cache.get_similar(query_embedding, version)
+            if response is not None:
+                yield response
+                return
+
+            started = time.perf_counter()
+            docs, report = self._context(generation, query, generation.hybrid.search(query, query_embedding))
+            # Same prompt the "stuff" chain would send, but streamed from the LLM
+            chain = self.qa_chain
+            prompt = chain.llm_chain.prompt.format(**{
+                chain.document_variable_name: chain.document_separator.join(doc.page_content for doc in docs),
+                'question': query
+            })
+            pieces = []
+            llm_started = time.perf_counter()
+            for piece in self.llm.stream(prompt):
+                pieces.append(piece)
+                yield piece
+            self._log_context(query, report, time.perf_counter() - llm_started)
+            self.answer_cache.put(query, query_embedding, ''.join(pieces), version, time.perf_counter() - started)
+
+    def _generate(self, generation, query, query_embedding, docs, started):
+        """Run the LLM over retrieved documents and cache the answer"""
+        docs, report = self._context(generation, query, docs)
+        llm_started = time.perf_counter()
+        response = self.qa_chain.run(input_documents=docs, question=query)
+        self._log_context(query, report, time.perf_counter() - llm_started)
+        self.answer_cache.put(query, query_embedding, response, generation.version, time.perf_counter() - started)
+        return response
+
+    def _context(self, generation, query, docs):
+        """Cut the retrieved chunks down to the prompt's token budget; returns (docs, report)"""
+        if self.compressor is None or not docs:
+            return docs, None
+        return self.compressor.compress(query, docs, generation.hybrid.bm25().idf)
 
-# Global RAG processor instance
+    def _log_context(self, query, report, llm_seconds):
+        if report is None:
+            return
+        logger.info(
+            f"Context for query: {query}: {report['tokens_before']} -> {report['tokens_after']} tokens "
+            f"({report['tokens_saved']} saved, {'cached' if report['cached'] else 'compressed'} in "
+            f"{1000 * report['seconds']:.1f} ms), LLM {llm_seconds:.2f}s"
+        )
+
+# Global RAG processor instance and the pool that runs queries off the request thread
 rag_processor = None
+query_pool = None
+
+def init_client(pdf_path=None, snapshot_dir=None, register=True, reload_interval=0):
+    """Initialize and register the client agent.
 
-def init_client(pdf_path):
-    """Initialize and register the client agent."""
-    global client_identity, rag_processor
+    Serving workers pass a `snapshot_dir` and register=False: the parent
+    process has already ingested and registered. With `reload_interval`
+    seconds, the documents (or, for workers, the snapshot CURRENT points
+    at) are polled and changes are served without a restart.
+    """
+    global client_identity, rag_processor, query_pool
     try:
         # Initialize RAG processor
-        rag_processor = RAGProcessor(pdf_path)
+        if pdf_path is not None and reload_interval:
+            builder = SnapshotBuilder(pdf_path, *make_embeddings(os.getenv("RAG_EMBEDDINGS", "openai")), snapshot_root())
+            # Taken before the build, so a PDF changed while it runs is picked up on the first poll
+            fingerprint = documents_fingerprint(pdf_path)
+            rag_processor = RAGProcessor(
+                snapshot_dir=builder.build(),
+                embeddings=builder.embeddings,
+                embedding_model=builder.embedding_model
+            )
+            # Ingest runs on the watcher thread; queries keep using the old generation until the swap
+            PollingWatcher(
+                lambda: documents_fingerprint(pdf_path),
+                lambda: rag_processor.swap_snapshot(builder.build()),
+                interval=reload_interval,
+                name="rag-document-watcher",
+                initial=fingerprint
+            )
+        elif snapshot_dir is not None and reload_interval:
+            rag_processor = RAGProcessor(snapshot_dir=snapshot_dir)
+            root = os.path.dirname(snapshot_dir)
+            PollingWatcher(
+                lambda: current_snapshot(root),
+                lambda: rag_processor.swap_snapshot(current_snapshot(root)),
+                interval=reload_interval,
+                name="rag-snapshot-watcher"
+            )
+        else:
+            rag_processor = RAGProcessor(pdf_path, snapshot_dir)
+        query_pool = WorkerPool(
+            num_workers=int(os.getenv("RAG_QUERY_WORKERS", "4")),
+            max_queue_size=int(os.getenv("RAG_QUERY_QUEUE_SIZE", "100")),
+            name="rag-query"
+        )
         
         # Initialize agent identity
         client_identity = Identity.from_seed(os.getenv("AGENT_SECRET_KEY_1_RAG"), 0)
         logger.info(f"Client agent started with address: {client_identity.address}")
 
+        if register:
+            register_agent()
+    except Exception as e:
+        logger.error(f"Initialization error: {e}")
+        raise
+
+def register_agent():
+    """Register the agent's identity and webhook with Agentverse"""
+    try:
         readme = """
             ![domain:innovation-lab](https://img.shields.io/badge/innovation--lab-3D8BD3)
             domain:rag-processing
@@ -83,12 +377,20 @@ def init_client(pdf_path):
                 <use_case>To answer questions about the content of the loaded PDF.</use_case>
             </use_cases>
             <payload_requirements>
-            <description>This agent requires a query in text format.</description>
+            <description>This agent requires a query in text format, or a list of queries.</description>
             <payload>
                 <requirement>
                     <parameter>query</parameter>
                     <description>The question to be answered using RAG.</description>
                 </requirement>
+                <requirement>
+                    <parameter>queries</parameter>
+                    <description>Optional list of questions answered together in one reply.</description>
+                </requirement>
+                <requirement>
+                    <parameter>stream</parameter>
+                    <description>Optional; when true the answer is sent back as numbered partial chunks.</description>
+                </requirement>
             </payload>
             </payload_requirements>
         """
@@ -106,6 +408,74 @@ def init_client(pdf_path):
         logger.error(f"Initialization error: {e}")
         raise
 
+def answer_query(sender, query, query_id):
+    """Worker job: run the query through RAG and send the answer back"""
+    response = rag_processor.process_query(query)
+    logger.info(f"Generated response for query: {query}")
+
+    # Send response back to the agent that sent the query
+    send_message_to_agent(
+        client_identity,
+        sender,
+        {
+            'response': response,
+            'query_id': query_id
+        }
+    )
+
+def stream_answer(sender, query, query_id):
+    """Worker job: stream the answer back as numbered chunks.
+
+    Generated pieces are coalesced so a message goes out when
+    RAG_STREAM_CHUNK_CHARS characters have built up or RAG_STREAM_FLUSH_SECONDS
+    have passed; the first piece is sent at once to minimise time to first
+    token. The final message has done=True.
+    """
+    chunk_chars = int(os.getenv("RAG_STREAM_CHUNK_CHARS", "64"))
+    flush_seconds = float(os.getenv("RAG_STREAM_FLUSH_SECONDS", "0.25"))
+    seq = 0
+    buffer = []
+    buffered = 0
+    last_flush = None
+
+    def send(chunk, done=False, error=None):
+        payload = {'query_id': query_id, 'seq': seq, 'chunk': chunk, 'done': done}
+        if error:
+            payload['error'] = error
+        send_message_to_agent(client_identity, sender, payload)
+
+    try:
+        for piece in rag_processor.stream_query(query):
+            buffer.append(piece)
+            buffered += len(piece)
+            now = time.perf_counter()
+            if last_flush is None or buffered >= chunk_chars or now - last_flush >= flush_seconds:
+                send(''.join(buffer))
+                seq += 1
+                buffer, buffered, last_flush = [], 0, now
+        send(''.join(buffer), done=True)
+        logger.info(f"Streamed response for query: {query} in {seq + 1} messages")
+    except Exception as e:
+        logger.error(f"Error streaming query: {str(e)}")
+        send(''.join(buffer), done=True, error=f"Error processing query: {str(e)}")
+
+def answer_queries(sender, queries, query_id):
+    """Worker job: answer a batch of queries and send one correlated reply"""
+    responses = rag_processor.process_queries(queries)
+    logger.info(f"Generated responses for a batch of {len(queries)} queries")
+
+    send_message_to_agent(
+        client_identity,
+        sender,
+        {
+            'responses': [
+                {'query': query, 'response': response}
+                for query, response in zip(queries, responses)
+            ],
+            'query_id': query_id
+        }
+    )
+
 @app.route('/api/webhook', methods=['POST'])
 def webhook():
     """Handle incoming queries"""
@@ -115,41 +485,106 @@ def webhook():
 
         message = parse_message_from_agent(data)
         query = message.payload.get('query')
+        queries = message.payload.get('queries')
         query_id = message.payload.get('query_id')
+        stream = message.payload.get('stream', False)
         
-        if not query:
+        if queries is not None:
+            if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q for q in queries):
+                return jsonify({"error": "queries must be a non-empty list of strings"}), 400
+            max_batch_size = int(os.getenv("RAG_MAX_BATCH_SIZE", "500"))
+            if len(queries) > max_batch_size:
+                return jsonify({"error": f"Batch exceeds {max_batch_size} queries"}), 400
+        elif not query:
             return jsonify({"error": "No query provided"}), 400
 
-        # Process query using RAG
-        response = rag_processor.process_query(query)
-        logger.info(f"Generated response for query: {query}")
-        
-        # Send response back to Agent 2
-        send_message_to_agent(
-            client_identity,
-            message.sender,  # Send back to the agent that sent the query
-            {
-                'response': response,
-                'query_id': query_id
-            }
-        )
-        
+        # Acknowledge now; a worker answers and replies to the sender later
+        try:
+            if queries is not None:
+                query_pool.submit(answer_queries, message.sender, queries, query_id)
+            elif stream:
+                query_pool.submit(stream_answer, message.sender, query, query_id)
+            else:
+                query_pool.submit(answer_query, message.sender, query, query_id)
+        except QueueFullError as e:
+            logger.warning(f"Rejecting query {query_id}: {e}")
+            return jsonify({"error": str(e)}), 429
+
         return jsonify({
-            "status": "success"
-        })
+            "status": "accepted",
+            "query_id": query_id
+        }), 202
 
     except Exception as e:
         logger.error(f"Error in webhook: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Expose answer cache, context compression and query queue statistics for tuning"""
+    return jsonify({
+        "answer_cache": rag_processor.answer_cache.stats(),
+        "context": rag_processor.compressor.stats() if rag_processor.compressor else None,
+        "query_queue": query_pool.stats()
+    })
+
+def serve_worker(sock, snapshot_dir, reload_interval=0):
+    """Worker process: open the shared snapshot and serve requests on the inherited socket"""
+    init_client(snapshot_dir=snapshot_dir, register=False, reload_interval=reload_interval)
+    make_server("0.0.0.0", 5002, app, threaded=True, fd=sock.fileno()).serve_forever()
+
+def serve(pdf_path, num_workers, reload_interval=0):
+    """Ingest once, export a memory-mapped snapshot and serve it from `num_workers` processes.
+
+    All workers accept on one listening socket and map the same snapshot
+    files read-only, so they start in milliseconds and share the vectors and
+    the BM25 index through the page cache instead of each holding a copy. With
+    `reload_interval`, this process re-ingests changed documents into a new
+    snapshot and the workers follow CURRENT to it.
+    """
+    global client_identity
+    builder = SnapshotBuilder(pdf_path, *make_embeddings(os.getenv("RAG_EMBEDDINGS", "openai")), snapshot_root())
+    fingerprint = documents_fingerprint(pdf_path)
+    snapshot_dir = builder.build()
+    if reload_interval:
+        PollingWatcher(
+            lambda: documents_fingerprint(pdf_path),
+            builder.build,
+            interval=reload_interval,
+            name="rag-document-watcher",
+            initial=fingerprint
+        )
+
+    client_identity = Identity.from_seed(os.getenv("AGENT_SECRET_KEY_1_RAG"), 0)
+    register_agent()
+
+    sock = socket.create_server(("0.0.0.0", 5002), backlog=128)
+    # Spawned, not forked, so workers never inherit the ingest process's Chroma state
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=serve_worker, args=(sock, snapshot_dir, reload_interval), name=f"rag-worker-{i}")
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Serving {snapshot_dir} from {num_workers} worker processes")
+    for worker in workers:
+        worker.join()
+
 if __name__ == "__main__":
     load_dotenv()
     
-    # Get PDF path from command line argument
+    # Get PDF path (or directory of PDFs) from command line argument
     if len(sys.argv) != 2:
-        print("Usage: python rag_agent.py <path_to_pdf>")
+        print("Usage: python rag_agent.py <path_to_pdf_or_directory>")
         sys.exit(1)
     
     pdf_path = sys.argv[1]
-    init_client(pdf_path)
-    app.run(host="0.0.0.0", port=5002)
\ No newline at end of file
+    num_workers = int(os.getenv("RAG_SERVE_WORKERS", "1"))
+    # Seconds between checks for changed documents; 0 disables hot reload
+    reload_interval = float(os.getenv("RAG_RELOAD_INTERVAL", "0"))
+    if num_workers > 1:
+        serve(pdf_path, num_workers, reload_interval)
+    else:
+        init_client(pdf_path, reload_interval=reload_interval)
+        app.run(host="0.0.0.0", port=5002)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from fetchai.crypto import Identity
 from fetchai.registration import register_with_agentverse
@@ -6,9 +6,8 @@ from fetchai.communication import send_message_to_agent, parse_message_from_agen
 import logging
 import os
 from dotenv import load_dotenv
-import threading
-from queue import Queue
-import time
+from correlation import QueryCorrelator
+import json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -16,14 +15,18 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Initialising client identity and response queue
+# Initialising client identity and the registry of in-flight queries
 client_identity = None
-response_queues = {}
+correlator = None
 
 def init_client():
     """Initialize and register the client agent."""
-    global client_identity
+    global client_identity, correlator
     try:
+        correlator = QueryCorrelator(
+            timeout=float(os.getenv("QUERY_TIMEOUT", "30")),
+            result_ttl=float(os.getenv("QUERY_RESULT_TTL", "300"))
+        )
         client_identity = Identity.from_seed(os.getenv("AGENT_SECRET_KEY_2"), 0)
         logger.info(f"Client agent started with address: {client_identity.address}")
 
@@ -42,6 +45,10 @@ def init_client():
                     <parameter>query</parameter>
                     <description>The question to be processed by RAG.</description>
                 </requirement>
+                <requirement>
+                    <parameter>queries</parameter>
+                    <description>Optional list of questions sent together in one message.</description>
+                </requirement>
             </payload>
             </payload_requirements>
         """
@@ -68,12 +75,24 @@ def webhook():
         logger.info("Received response from RAG agent")
 
         message = parse_message_from_agent(data)
-        response = message.payload.get('response')
+        # Batch replies carry a list of {query, response} under 'responses'
+        response = message.payload.get('responses', message.payload.get('response'))
         query_id = message.payload.get('query_id')
 
-        if query_id in response_queues:
-            response_queues[query_id].put(response)
+        # Streamed replies arrive as numbered chunks
+        if 'seq' in message.payload:
+            correlator.push_chunk(
+                query_id,
+                message.payload['seq'],
+                {'chunk': message.payload.get('chunk', ''), 'error': message.payload.get('error')},
+                message.payload.get('done', False)
+            )
+            return jsonify({"status": "success"})
+
+        if correlator.resolve(query_id, response):
             logger.info(f"Stored response for query_id: {query_id}")
+        else:
+            logger.info(f"Dropping response for unknown or expired query_id: {query_id}")
 
         return jsonify({"status": "success"})
 
@@ -81,9 +100,55 @@ def webhook():
         logger.error(f"Error in webhook: {e}")
         return jsonify({"error": str(e)}), 500
 
+def dispatch_query(rag_agent_address, payload, fields, wait, timeout):
+    """Send a query message to the RAG agent and collect the reply.
+
+    `fields` are echoed back to the caller alongside the response; with
+    wait=False only the query_id is returned.
+    """
+    query_id = correlator.register(timeout)
+    payload = {**payload, 'query_id': query_id}
+
+    # Send query to RAG agent
+    try:
+        send_message_to_agent(
+            client_identity,
+            rag_agent_address,
+            payload
+        )
+    except Exception:
+        correlator.discard(query_id)
+        raise
+
+    if not wait:
+        return jsonify({
+            "status": "pending",
+            **fields,
+            "query_id": query_id
+        }), 202
+
+    # Wait for response with timeout
+    status, response = correlator.wait(query_id, timeout)
+    if status == 'done':
+        return jsonify({
+            "status": "success",
+            **fields,
+            "response": response
+        })
+
+    correlator.discard(query_id)  # Late responses are dropped
+    return jsonify({
+        "status": "error",
+        "message": "Timeout waiting for response"
+    }), 408
+
 @app.route('/api/send-query', methods=['POST'])
 def send_query():
-    """Send query to the RAG processing agent and wait for response"""
+    """Send query to the RAG processing agent and wait for response.
+
+    With "wait": false the query_id is returned immediately and the answer is
+    collected from /api/responses/<query_id>.
+    """
     try:
         data = request.json
         query = data.get('query')
@@ -92,45 +157,130 @@ def send_query():
         if not query or not rag_agent_address:
             return jsonify({"error": "Missing query or agent address"}), 400
 
-        # Generate unique query ID
-        query_id = str(time.time())
-        response_queues[query_id] = Queue()
-
         logger.info(f"Sending query: {query}")
-
-        payload = {
-            'query': query,
-            'query_id': query_id
-        }
-
-        # Send query to RAG agent
-        send_message_to_agent(
-            client_identity,
+        return dispatch_query(
             rag_agent_address,
-            payload
+            {'query': query},
+            {"query": query},
+            data.get('wait', True),
+            correlator.timeout
         )
 
-        # Wait for response with timeout
+    except Exception as e:
+        logger.error(f"Error sending query: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/send-query/stream', methods=['POST'])
+def send_query_stream():
+    """Send a query and stream the answer back as Server-Sent Events.
+
+    Emits one "chunk" event per partial answer, in order, then a "done"
+    event; an "error" event is sent if the agent fails or goes quiet for
+    longer than the query timeout.
+    """
+    try:
+        data = request.json
+        query = data.get('query')
+        rag_agent_address = data.get('rag_agent_address')
+
+        if not query or not rag_agent_address:
+            return jsonify({"error": "Missing query or agent address"}), 400
+
+        query_id, stream_queue = correlator.register_stream()
+        logger.info(f"Sending streamed query: {query}")
         try:
-            response = response_queues[query_id].get(timeout=30)  # 30 second timeout
-            del response_queues[query_id]  # Cleanup
-            
-            return jsonify({
-                "status": "success",
-                "query": query,
-                "response": response
-            })
-        except:
-            del response_queues[query_id]  # Cleanup
-            return jsonify({
-                "status": "error",
-                "message": "Timeout waiting for response"
-            }), 408
+            send_message_to_agent(
+                client_identity,
+                rag_agent_address,
+                {'query': query, 'query_id': query_id, 'stream': True}
+            )
+        except Exception:
+            correlator.discard(query_id)
+            raise
+
+        def events():
+            finished = False
+            try:
+                for seq, part, done in correlator.iter_stream(stream_queue):
+                    if part['chunk']:
+                        yield f"event: chunk\ndata: {json.dumps({'query_id': query_id, 'seq': seq, 'chunk': part['chunk']})}\n\n"
+                    if part['error']:
+                        yield f"event: error\ndata: {json.dumps({'query_id': query_id, 'message': part['error']})}\n\n"
+                    finished = done
+                if finished:
+                    yield f"event: done\ndata: {json.dumps({'query_id': query_id})}\n\n"
+                else:
+                    yield f"event: error\ndata: {json.dumps({'query_id': query_id, 'message': 'Timeout waiting for response'})}\n\n"
+            finally:
+                # Also runs when the client disconnects mid-stream
+                correlator.discard(query_id)
+
+        return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
     except Exception as e:
         logger.error(f"Error sending query: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/send-queries', methods=['POST'])
+def send_queries():
+    """Send a list of queries to the RAG agent in a single message.
+
+    The response is a list of {query, response} in the order sent.
+    """
+    try:
+        data = request.json
+        queries = data.get('queries')
+        rag_agent_address = data.get('rag_agent_address')
+
+        if not queries or not isinstance(queries, list) or not rag_agent_address:
+            return jsonify({"error": "Missing queries list or agent address"}), 400
+        if not all(isinstance(q, str) and q.strip() for q in queries):
+            return jsonify({"error": "queries must be a non-empty list of strings"}), 400
+        max_batch_size = int(os.getenv("RAG_MAX_BATCH_SIZE", "500"))
+        if len(queries) > max_batch_size:
+            return jsonify({"error": f"Batch exceeds {max_batch_size} queries"}), 400
+
+        logger.info(f"Sending batch of {len(queries)} queries")
+        return dispatch_query(
+            rag_agent_address,
+            {'queries': queries},
+            {"queries": queries},
+            data.get('wait', True),
+            float(os.getenv("QUERY_BATCH_TIMEOUT", "300"))
+        )
+
+    except Exception as e:
+        logger.error(f"Error sending queries: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/responses/<query_id>', methods=['GET'])
+def get_response(query_id):
+    """Collect the answer to a query (or batch) sent with "wait": false.
+
+    Returns immediately unless ?wait=<seconds> asks to long-poll.
+    """
+    try:
+        wait_seconds = min(float(request.args.get('wait', 0)), correlator.timeout)
+        if wait_seconds > 0:
+            status, response = correlator.wait(query_id, wait_seconds)
+        else:
+            status, response = correlator.poll(query_id)
+
+        if status == 'done':
+            return jsonify({"status": "success", "query_id": query_id, "response": response})
+        if status == 'pending':
+            return jsonify({"status": "pending", "query_id": query_id}), 202
+        return jsonify({"status": "error", "message": "Unknown or expired query_id"}), 404
+
+    except Exception as e:
+        logger.error(f"Error fetching response: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Expose in-flight query statistics"""
+    return jsonify({"queries": correlator.stats()})
+
 if __name__ == "__main__":
     load_dotenv()
     init_client()
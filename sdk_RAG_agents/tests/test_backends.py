@@ -0,0 +1,91 @@
+import hashlib
+import os
+import threading
+import time
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain")
+pytest.importorskip("pypdf")
+
+from backends import LocalEmbeddings
+from ingest import IngestionPipeline
+
+PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "pdfs", "BiLSTM.pdf")
+
+
+def text_vector(text):
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    return [float(b) for b in digest[:4]]
+
+
+class PoolModel:
+    """Stands in for a SentenceTransformer with a started multi-process pool"""
+
+    def __init__(self):
+        self.pool_calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def encode_multi_process(self, texts, pool, batch_size=32, chunk_size=None, normalize_embeddings=False):
+        with self._lock:
+            self.pool_calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        return [text_vector(text) for text in texts]
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        raise AssertionError("ingest must embed through the process pool")
+
+
+class MemoryIndex:
+    """The parts of PersistentVectorIndex the ingestion pipeline uses"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.entries = {}
+        self.manifest = {}
+
+    def text_id(self, source, text):
+        return hashlib.sha256(f"{source}\0{text}".encode('utf-8')).hexdigest()
+
+    def source_entry(self, source):
+        return self.manifest.get(source)
+
+    def sources(self):
+        return list(self.manifest)
+
+    def record_source(self, source, file_hash, ids):
+        self.manifest[source] = {'sha256': file_hash, 'ids': list(ids)}
+
+    def add_embeddings(self, ids, texts, embeddings, metadatas):
+        for entry_id, text, vector in zip(ids, texts, embeddings):
+            self.entries[entry_id] = (text, vector)
+
+    def delete(self, ids):
+        for entry_id in ids:
+            self.entries.pop(entry_id, None)
+
+
+def test_ingest_embeds_through_the_pool_one_call_at_a_time():
+    embeddings = LocalEmbeddings.__new__(LocalEmbeddings)
+    embeddings.model = PoolModel()
+    embeddings.batch_size = 8
+    embeddings.num_workers = 4
+    embeddings._pool = object()
+    embeddings._pool_lock = threading.Lock()
+
+    index = MemoryIndex(embeddings)
+    IngestionPipeline(index, chunk_size=300, chunk_overlap=50, batch_size=8, max_workers=4).ingest(PDF)
+
+    assert index.entries
+    assert embeddings.model.pool_calls >= len(index.entries) / 8
+    # Concurrent ingest threads never share the pool's queues
+    assert embeddings.model.max_active == 1
+    for text, vector in index.entries.values():
+        assert list(vector) == text_vector(text)
@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain")
+
+from langchain.schema import Document
+from compression import ContextCompressor
+
+
+def flat_idf(term):
+    return 1.0
+
+
+def test_keeps_relevant_sentences_under_budget():
+    compressor = ContextCompressor(token_budget=30)
+    docs = [
+        Document(page_content="The forget gate decides what to drop. Weather is nice today."),
+        Document(page_content="The forget gate decides what to drop. Cats are great pets."),
+    ]
+    compressed, report = compressor.compress("What does the forget gate decide?", docs, flat_idf)
+
+    text = " ".join(doc.page_content for doc in compressed)
+    assert text.count("forget gate") == 1
+    assert "Cats" not in text
+    assert report['tokens_after'] <= 30
+    assert compressor.compress("What does the forget gate decide?", docs, flat_idf)[1]['cached']
+
+
+def test_truncates_best_sentence_when_every_sentence_is_over_budget():
+    compressor = ContextCompressor(token_budget=8)
+    long_sentence = "The forget gate " + " ".join(f"word{i}" for i in range(50)) + "."
+    docs = [Document(page_content=long_sentence), Document(page_content="Unrelated " * 40)]
+    compressed, report = compressor.compress("forget gate", docs, flat_idf)
+
+    assert len(compressed) == 1
+    assert compressed[0].page_content.startswith("The forget gate")
+    assert 0 < report['tokens_after'] <= 8
+
+
+def test_truncates_top_chunk_without_sentence_terms():
+    compressor = ContextCompressor(token_budget=5)
+    compressed, report = compressor.compress("anything", [Document(page_content="... --- ... " * 20)], flat_idf)
+
+    assert compressed and 0 < report['tokens_after'] <= 5
@@ -0,0 +1,22 @@
+import threading
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("pypdf")
+
+from hot_reload import PollingWatcher
+
+
+def test_watcher_handles_a_change_made_before_it_started():
+    # The documents changed during the initial build: the watcher starts from the earlier fingerprint
+    changed = threading.Event()
+    PollingWatcher(lambda: "after", changed.set, interval=0.01, initial="before")
+
+    assert changed.wait(2)
+
+
+def test_watcher_ignores_an_unchanged_fingerprint():
+    changed = threading.Event()
+    PollingWatcher(lambda: "same", changed.set, interval=0.01)
+
+    assert not changed.wait(0.2)
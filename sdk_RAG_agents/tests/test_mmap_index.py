@@ -0,0 +1,47 @@
+import random
+import types
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain")
+
+from hybrid import BM25Index, HybridRetriever
+from mmap_index import MmapVectorIndex, export_snapshot
+
+
+def make_store(texts, version='v1'):
+    """Stands in for PersistentVectorIndex: just what export_snapshot reads"""
+    rng = random.Random(0)
+    result = {
+        'ids': [f"id{i}" for i in range(len(texts))],
+        'documents': texts,
+        'metadatas': [None] * len(texts),
+        'embeddings': [[rng.random() for _ in range(8)] for _ in texts]
+    }
+    collection = types.SimpleNamespace(get=lambda include: result)
+    return types.SimpleNamespace(version=version, model_name='fake:8', vector_store=types.SimpleNamespace(_collection=collection))
+
+
+def test_snapshot_bm25_matches_in_memory_bm25(tmp_path):
+    rng = random.Random(1)
+    words = [f"w{i}" for i in range(300)] + ["lstm", "h_t", "bi-lstm", "gate", "été"]
+    texts = [" ".join(rng.choice(words) for _ in range(rng.randint(5, 60))) for _ in range(500)]
+    index = MmapVectorIndex(export_snapshot(make_store(texts), str(tmp_path)))
+
+    reference = BM25Index(index.all_entries())
+    mapped = index.bm25_index()
+    for query in ["lstm gate w1", "h_t bi-lstm", "été w299 w3 missing", "missing"]:
+        assert [entry_id for entry_id, _ in mapped.search(query, 5)] == \
+            [entry_id for entry_id, _ in reference.search(query, 5)]
+        for term in query.split():
+            assert mapped.idf(term) == pytest.approx(reference.idf(term))
+
+    # The retriever opens the snapshot's index instead of rebuilding one from every entry
+    assert HybridRetriever(index).bm25() is mapped
+
+
+def test_empty_snapshot(tmp_path):
+    index = MmapVectorIndex(export_snapshot(make_store([]), str(tmp_path)))
+
+    assert len(index) == 0
+    assert index.bm25_index().search("lstm", 3) == []
@@ -0,0 +1,138 @@
+from langchain_community.vectorstores import Chroma
+from langchain.schema import Document
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path):
+    """Hash a file's contents without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PersistentVectorIndex:
+    """On-disk Chroma index keyed by document contents and embedding model.
+
+    A manifest next to the Chroma files records, per source PDF, the hash of
+    the file and the ids of the entries it produced. Entry ids are hashes of
+    the embedding model, the source and the text, so unchanged text is never
+    re-embedded. Populated by ingest.IngestionPipeline.
+    """
+
+    def __init__(self, embeddings, model_name, persist_directory):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.persist_directory = persist_directory
+        os.makedirs(persist_directory, exist_ok=True)
+
+        self.manifest_path = os.path.join(persist_directory, "manifest.json")
+        self.manifest = self._load_manifest()
+        self._version = None
+
+        # One collection per embedding model: vectors from different models
+        # are not comparable and must never share a collection
+        model_digest = hashlib.sha256(model_name.encode('utf-8')).hexdigest()[:16]
+        self.vector_store = Chroma(
+            collection_name=f"rag_store_{model_digest}",
+            embedding_function=embeddings,
+            persist_directory=persist_directory
+        )
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                if manifest.get('model') == self.model_name:
+                    return manifest
+                logger.info("Embedding model changed, ignoring existing manifest")
+            except json.JSONDecodeError:
+                logger.warning("Corrupt index manifest, rebuilding")
+        return {'model': self.model_name, 'sources': {}}
+
+    def _save_manifest(self):
+        # Write-then-rename so a crash never leaves a half-written manifest
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._version = None
+
+    @property
+    def version(self):
+        """Fingerprint of the indexed content; changes whenever any source does"""
+        if self._version is None:
+            sources = sorted((source, entry['sha256']) for source, entry in self.manifest['sources'].items())
+            self._version = hashlib.sha256(json.dumps([self.model_name, sources]).encode('utf-8')).hexdigest()
+        return self._version
+
+    def text_id(self, source, text):
+        """Stable id for a piece of a source's text under the current embedding model"""
+        return hashlib.sha256(f"{self.model_name}\0{source}\0{text}".encode('utf-8')).hexdigest()
+
+    def source_entry(self, source):
+        """Return the manifest entry (file hash and entry ids) for a source, if indexed"""
+        return self.manifest['sources'].get(source)
+
+    def sources(self):
+        return list(self.manifest['sources'])
+
+    def forget_source(self, source):
+        """Remove a source and all of its entries, returning how many were removed"""
+        entry = self.manifest['sources'].pop(source, None)
+        if not entry:
+            return 0
+        if entry['ids']:
+            self.delete(entry['ids'])
+        self._save_manifest()
+        return len(entry['ids'])
+
+    def record_source(self, source, file_hash, ids):
+        self.manifest['sources'][source] = {'sha256': file_hash, 'ids': list(ids)}
+        self._save_manifest()
+
+    def add_embeddings(self, ids, texts, embeddings, metadatas):
+        """Write precomputed vectors, bypassing the store's own embedding call"""
+        self.vector_store._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas
+        )
+
+    def delete(self, ids):
+        self.vector_store.delete(ids=ids)
+
+    def search_by_vectors(self, embeddings, k=4):
+        """Nearest entries for several query vectors in a single store round trip"""
+        return [[doc for _, doc in entries] for entries in self.search_entries_by_vectors(embeddings, k)]
+
+    def search_entries_by_vectors(self, embeddings, k=4):
+        """Like search_by_vectors, but as (id, Document) pairs"""
+        result = self.vector_store._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            include=['documents', 'metadatas']
+        )
+        return [
+            [
+                (entry_id, Document(page_content=text, metadata=metadata or {}))
+                for entry_id, text, metadata in zip(ids, texts, metadatas)
+            ]
+            for ids, texts, metadatas in zip(result['ids'], result['documents'], result['metadatas'])
+        ]
+
+    def all_entries(self):
+        """Every stored chunk as (id, Document) pairs, for building lexical indexes"""
+        result = self.vector_store._collection.get(include=['documents', 'metadatas'])
+        return [
+            (entry_id, Document(page_content=text, metadata=metadata or {}))
+            for entry_id, text, metadata in zip(result['ids'], result['documents'], result['metadatas'])
+        ]
@@ -0,0 +1,93 @@
+from collections import deque
+from queue import Queue, Full
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a pool whose queue is full"""
+
+
+class WorkerPool:
+    """Fixed set of worker threads fed by a bounded job queue.
+
+    `submit` never blocks: once `max_queue_size` jobs are waiting it raises
+    QueueFullError, which callers turn into backpressure (HTTP 429). Queue
+    depth, queue wait time and processing time are tracked for `stats`.
+    """
+
+    def __init__(self, num_workers=4, max_queue_size=100, name="worker", sample_size=1000):
+        self._queue = Queue(maxsize=max_queue_size)
+        self.max_queue_size = max_queue_size
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=sample_size)
+        self._processing_times = deque(maxlen=sample_size)
+        self._counts = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+        self._busy = 0
+        self._workers = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn, *args, **kwargs):
+        try:
+            self._queue.put_nowait((time.perf_counter(), fn, args, kwargs))
+        except Full:
+            with self._lock:
+                self._counts['rejected'] += 1
+            raise QueueFullError(f"Job queue is full ({self.max_queue_size} pending)")
+        with self._lock:
+            self._counts['submitted'] += 1
+
+    def _run(self):
+        while True:
+            enqueued_at, fn, args, kwargs = self._queue.get()
+            started = time.perf_counter()
+            with self._lock:
+                self._busy += 1
+                self._wait_times.append(started - enqueued_at)
+            outcome = 'completed'
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                outcome = 'failed'
+                logger.error(f"Job failed: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._counts[outcome] += 1
+                    self._processing_times.append(time.perf_counter() - started)
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats['busy_workers'] = self._busy
+            wait_times = list(self._wait_times)
+            processing_times = list(self._processing_times)
+        stats['workers'] = len(self._workers)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self.max_queue_size
+        stats['wait_ms'] = _summarize(wait_times)
+        stats['processing_ms'] = _summarize(processing_times)
+        return stats
+
+
+def _summarize(samples):
+    """Mean, p50, p95 and max of recent samples, in milliseconds"""
+    if not samples:
+        return {'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    ordered = sorted(samples)
+    def pick(q):
+        return round(1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+    return {
+        'avg': round(1000 * sum(ordered) / len(ordered), 3),
+        'p50': pick(0.5),
+        'p95': pick(0.95),
+        'max': round(1000 * ordered[-1], 3)
+    }
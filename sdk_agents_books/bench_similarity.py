@@ -0,0 +1,58 @@
+from book_index import BookIndex
+from similarity import ExactSimilarity, IVFSimilarity
+import logging
+import numpy as np
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def timed_search(backend, queries, k, **kwargs):
+    results, latencies = [], []
+    for row, query in queries:
+        started = time.perf_counter()
+        results.append(backend.search(query, k=k, exclude_rows=(row,), **kwargs))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.array(latencies)
+
+
+def recall_at_k(truth, results):
+    """Mean fraction of the exact top k that the approximate search also returned"""
+    hits = [
+        len({row for row, _ in expected} & {row for row, _ in found}) / max(1, len(expected))
+        for expected, found in zip(truth, results)
+    ]
+    return float(np.mean(hits))
+
+
+def benchmark(index_dir, queries=200, k=5, nprobes=(1, 4, 8, 16, 32, 64), shortlists=(None, 100), seed=0):
+    """Compare recall@k and latency of the IVF index against exact search.
+
+    Each nprobe is run re-scoring all probed candidates exactly (shortlist
+    None) and re-scoring only the best `shortlist` by reduced score.
+    """
+    index = BookIndex(index_dir)
+    ann = IVFSimilarity.load(index_dir, matrix=index.matrix)
+    rows = np.random.default_rng(seed).choice(index.matrix.shape[0], size=min(queries, index.matrix.shape[0]), replace=False)
+    sample = [(int(row), index.matrix[int(row)]) for row in rows]
+
+    truth, latencies = timed_search(ExactSimilarity(index.matrix), sample, k)
+    print(f"{'backend':<14}{'recall@' + str(k):>10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}")
+    for shortlist in shortlists:
+        for nprobe in nprobes:
+            results, latencies = timed_search(ann, sample, k, nprobe=nprobe, shortlist=shortlist)
+            name = f"ivf/{nprobe}" + (f"/r{shortlist}" if shortlist else "")
+            print(
+                f"{name:<14}{recall_at_k(truth, results):>10.3f}"
+                f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 2:
+        print("Usage: python bench_similarity.py <index_dir>")
+        sys.exit(1)
+    benchmark(sys.argv[1])
@@ -0,0 +1,244 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy.sparse import csr_matrix
+from similarity import ExactSimilarity, IVFSimilarity
+import gzip
+import json
+import logging
+import numpy as np
+import os
+import pickle
+import re
+import sqlite3
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def book_features(book):
+    """Concatenate subjects, authors and description into one feature string"""
+    features = []
+
+    subjects = book.get('subject', [])
+    features.extend(subjects)
+
+    authors = book.get('author_name', [])
+    features.extend(authors)
+
+    if isinstance(book.get('description'), dict):
+        features.append(book['description'].get('value', ''))
+    elif isinstance(book.get('description'), str):
+        features.append(book['description'])
+
+    return ' '.join(str(f) for f in features)
+
+
+def normalize_title(title):
+    return re.sub(r'\s+', ' ', str(title or '')).strip().lower()
+
+
+def iter_dump(path):
+    """Yield works from an OpenLibrary dump or a local JSON-lines sample.
+
+    Official works dumps (optionally gzipped) are tab-separated with the
+    record JSON in the last column and use `subjects`; samples hold one
+    search-style doc per line (`subject`, `author_name`). Both are mapped to
+    the search-doc shape used everywhere else.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line if line.startswith('{') else line.rsplit('\t', 1)[-1])
+            except json.JSONDecodeError:
+                continue
+            if not record.get('title') or not record.get('key'):
+                continue
+            year = record.get('first_publish_year')
+            if year is None and record.get('first_publish_date'):
+                match = re.search(r'\d{4}', record['first_publish_date'])
+                year = int(match.group()) if match else None
+            yield {
+                'key': record['key'],
+                'title': record['title'],
+                'author_name': record.get('author_name', []),
+                'subject': record.get('subject', record.get('subjects', [])),
+                'description': record.get('description', ''),
+                'first_publish_year': year
+            }
+
+
+def build_index(dump_path, out_dir, max_features=200000, min_df=1):
+    """Fit TF-IDF once over a dump and write a memory-mappable index to `out_dir`"""
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    db_path = os.path.join(out_dir, 'books.sqlite3')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db = sqlite3.connect(db_path)
+    db.execute(
+        "CREATE TABLE books (row INTEGER PRIMARY KEY, key TEXT NOT NULL, title TEXT NOT NULL, "
+        "norm_title TEXT NOT NULL, author TEXT, first_publish_year INTEGER, subjects TEXT)"
+    )
+
+    rows = []
+    def features():
+        # Metadata is written in the same single pass that feeds the vectorizer
+        for row, book in enumerate(iter_dump(dump_path)):
+            rows.append((
+                row, book['key'], book['title'], normalize_title(book['title']),
+                (book['author_name'] or ['Unknown'])[0], book['first_publish_year'],
+                json.dumps(book['subject'][:3])
+            ))
+            if len(rows) >= 10000:
+                db.executemany("INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                rows.clear()
+            yield book_features(book)
+
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=max_features, min_df=min_df, dtype=np.float32)
+    matrix = vectorizer.fit_transform(features()).tocsr()
+    db.executemany("INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    db.execute("CREATE INDEX books_norm_title ON books (norm_title)")
+    db.commit()
+    db.close()
+
+    # Rows are L2-normalised by the vectorizer, so cosine similarity is a dot product
+    np.save(os.path.join(out_dir, 'data.npy'), matrix.data)
+    np.save(os.path.join(out_dir, 'indices.npy'), matrix.indices)
+    np.save(os.path.join(out_dir, 'indptr.npy'), matrix.indptr)
+    with open(os.path.join(out_dir, 'vectorizer.pkl'), 'wb') as f:
+        pickle.dump(vectorizer, f)
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump({'shape': list(matrix.shape), 'source': os.path.abspath(dump_path), 'built_at': time.time()}, f)
+
+    logger.info(
+        f"Built book index with {matrix.shape[0]} works and {matrix.shape[1]} terms "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+class BookIndex:
+    """Memory-mapped TF-IDF index produced by `build_index`.
+
+    `backend` picks the similarity search: 'exact' brute force over the sparse
+    rows, or 'ivf' for the approximate index written by `build_ann`, whose
+    candidates are re-scored against the sparse rows (the `shortlist` best
+    by reduced score, or all of them).
+    """
+
+    def __init__(self, index_dir, backend='exact', nprobe=8, shortlist=None):
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, 'vectorizer.pkl'), 'rb') as f:
+            self.vectorizer = pickle.load(f)
+        self.matrix = csr_matrix(
+            (
+                np.load(os.path.join(index_dir, 'data.npy'), mmap_mode='r'),
+                np.load(os.path.join(index_dir, 'indices.npy'), mmap_mode='r'),
+                np.load(os.path.join(index_dir, 'indptr.npy'), mmap_mode='r')
+            ),
+            shape=tuple(meta['shape']),
+            copy=False
+        )
+        if backend == 'ivf' and not IVFSimilarity.exists(index_dir):
+            logger.warning(f"No IVF index in {index_dir} (build it with --ann); using exact search")
+            backend = 'exact'
+        if backend == 'ivf':
+            self.similarity = IVFSimilarity.load(index_dir, nprobe=nprobe, matrix=self.matrix, shortlist=shortlist)
+        else:
+            self.similarity = ExactSimilarity(self.matrix)
+        self._db = sqlite3.connect(f"file:{os.path.join(index_dir, 'books.sqlite3')}?mode=ro", uri=True, check_same_thread=False)
+        logger.info(f"Loaded book index with {self.matrix.shape[0]} works from {index_dir} ({self.similarity.name} search)")
+
+    def find_row(self, title):
+        """Row of the best-known work with this title, or None"""
+        row = self._db.execute(
+            "SELECT row FROM books WHERE norm_title = ? ORDER BY row LIMIT 1",
+            (normalize_title(title),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def vectorize(self, book):
+        return self.vectorizer.transform([book_features(book)])
+
+    def top_k(self, query_vector, k=5, exclude_rows=()):
+        """Rows and cosine scores of the k works most similar to `query_vector`"""
+        return self.similarity.search(query_vector, k=k, exclude_rows=exclude_rows)
+
+    def recommend(self, query_vector, k=5, seed_titles=(), exclude_rows=()):
+        """Recommendation dicts for the k most similar works with distinct titles.
+
+        Works titled like a seed (other editions of the queried book) are
+        skipped, as are repeats of a title already picked; the search
+        over-fetches, widening until k distinct titles are found or the
+        catalog runs out.
+        """
+        skip = {normalize_title(title) for title in seed_titles if title}
+        fetch = 4 * k + len(exclude_rows)
+        while True:
+            rows = self.top_k(query_vector, k=fetch, exclude_rows=exclude_rows)
+            titles = self.norm_titles([row for row, _ in rows])
+            seen = set(skip)
+            picked = []
+            for row, score in rows:
+                title = titles.get(row)
+                if title is None or title in seen:
+                    continue
+                seen.add(title)
+                picked.append((row, score))
+                if len(picked) == k:
+                    break
+            if len(picked) == k or len(rows) < fetch or fetch >= len(self.similarity):
+                return self.books(picked)
+            fetch *= 4
+
+    def norm_titles(self, rows):
+        """Normalised title of each given row"""
+        if not rows:
+            return {}
+        placeholders = ','.join('?' * len(rows))
+        return dict(self._db.execute(f"SELECT row, norm_title FROM books WHERE row IN ({placeholders})", list(rows)))
+
+    def books(self, rows):
+        """Recommendation dicts for the given (row, score) pairs, in order"""
+        if not rows:
+            return []
+        placeholders = ','.join('?' * len(rows))
+        records = {
+            record[0]: record for record in self._db.execute(
+                f"SELECT row, title, author, first_publish_year, subjects FROM books WHERE row IN ({placeholders})",
+                [row for row, _ in rows]
+            )
+        }
+        return [
+            {
+                'title': records[row][1],
+                'author': records[row][2] or 'Unknown',
+                'first_publish_year': records[row][3] if records[row][3] is not None else 'Unknown',
+                'subject': json.loads(records[row][4]),
+                'similarity_score': round(score, 3)
+            }
+            for row, score in rows if row in records
+        ]
+
+
+def build_ann(index_dir, dims=128, nlist=None):
+    """Build the approximate (IVF) search index over an existing book index"""
+    started = time.perf_counter()
+    ann = IVFSimilarity.build(BookIndex(index_dir).matrix, dims=dims, nlist=nlist)
+    ann.save(index_dir)
+    logger.info(f"Built IVF index with {len(ann.centroids)} lists in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) not in (3, 4) or (len(sys.argv) == 4 and sys.argv[3] != '--ann'):
+        print("Usage: python book_index.py <works_dump_or_sample> <index_dir> [--ann]")
+        sys.exit(1)
+    build_index(sys.argv[1], sys.argv[2])
+    if len(sys.argv) == 4:
+        build_ann(sys.argv[2])
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from book_index import book_features, normalize_title
+import hashlib
+import threading
+
+
+def title_key(title):
+    """64-bit hash of a normalised title, used for deduplication instead of the title itself"""
+    return int.from_bytes(hashlib.blake2b(normalize_title(title).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class Candidate:
+    """The parts of an OpenLibrary search doc that ranking and the response need"""
+    __slots__ = ('key', 'title', 'author', 'first_publish_year', 'subjects')
+
+    def __init__(self, doc):
+        self.key = doc.get('key')
+        self.title = doc.get('title')
+        self.author = (doc.get('author_name') or ['Unknown'])[0]
+        self.first_publish_year = doc.get('first_publish_year', 'Unknown')
+        self.subjects = tuple(doc.get('subject', [])[:3])
+
+    def recommendation(self, score):
+        return {
+            'title': self.title,
+            'author': self.author,
+            'first_publish_year': self.first_publish_year,
+            'subject': list(self.subjects),
+            'similarity_score': round(float(score), 3)
+        }
+
+
+def unique_candidates(docs, feature_cache):
+    """Compact candidates for the docs with distinct titles (first occurrence wins) and their count vectors.
+
+    Titles are compared by hash, and the full docs are only touched here, so
+    callers can drop them as soon as this returns.
+    """
+    seen = set()
+    candidates, kept = [], []
+    for doc in docs:
+        key = title_key(doc.get('title'))
+        if key not in seen:
+            seen.add(key)
+            candidates.append(Candidate(doc))
+            kept.append(doc)
+    return candidates, (feature_cache.vectors(kept) if kept else None)
+
+
+class FeatureCache:
+    """Term-count vectors for OpenLibrary works, computed once per work key.
+
+    Works are tokenised with a stateless HashingVectorizer, so a vector stays
+    valid across requests no matter which other books are in the pool; IDF
+    weighting is applied per request by `tfidf`. Up to `max_entries` vectors
+    are kept, least recently used evicted first.
+    """
+
+    def __init__(self, max_entries=50000, n_features=2 ** 20):
+        self.max_entries = max_entries
+        self.hasher = HashingVectorizer(
+            stop_words='english', n_features=n_features, alternate_sign=False, norm=None
+        )
+        self._lock = threading.Lock()
+        self._vectors = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def vectorize(self, docs):
+        """Uncached count vectors for the given docs"""
+        return self.hasher.transform([book_features(doc) for doc in docs]).tocsr()
+
+    def vectors(self, docs):
+        """Count vectors for the given docs, one row each, reusing cached works"""
+        rows = [None] * len(docs)
+        misses = []
+        with self._lock:
+            for i, doc in enumerate(docs):
+                row = self._vectors.get(doc.get('key')) if doc.get('key') else None
+                if row is None:
+                    misses.append(i)
+                else:
+                    self._vectors.move_to_end(doc['key'])
+                    rows[i] = row
+            self._stats['hits'] += len(docs) - len(misses)
+            self._stats['misses'] += len(misses)
+
+        if misses:
+            computed = self.vectorize([docs[i] for i in misses])
+            with self._lock:
+                for n, i in enumerate(misses):
+                    rows[i] = computed[n]
+                    if docs[i].get('key'):
+                        self._vectors[docs[i]['key']] = rows[i]
+                while len(self._vectors) > self.max_entries:
+                    self._vectors.popitem(last=False)
+        return vstack(rows, format='csr')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._vectors)
+        stats['capacity'] = self.max_entries
+        return stats
+
+
+def tfidf(counts):
+    """L2-normalised TF-IDF rows, with IDF taken over the rows given"""
+    return TfidfTransformer().fit_transform(counts)
@@ -0,0 +1,155 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import json
+import logging
+import requests
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_url(url):
+    """Cache key for a URL: scheme and host lowercased, http/https folded, query sorted"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit(('https', parts.netloc.lower(), parts.path, query, ''))
+
+
+class CachedHttpClient:
+    """Persistent SQLite cache in front of JSON GET requests.
+
+    Each URL path prefix in `ttls` gets its own freshness lifetime (the
+    longest matching prefix wins, `default_ttl` otherwise). A fresh entry is
+    served straight from disk. An entry up to `stale_ttl` seconds past its
+    lifetime is still served immediately while a background refresh fetches a
+    new copy (stale-while-revalidate). Older or missing entries are fetched
+    inline, and if that fetch fails or times out any cached copy is served
+    instead.
+    """
+
+    def __init__(self, db_path, ttls=None, default_ttl=3600, stale_ttl=86400, timeout=(3.05, 10),
+                 pool_size=10, retries=2, backoff_factor=0.3):
+        self.ttls = sorted((ttls or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+
+        # One keep-alive connection pool shared by every caller thread; idempotent
+        # GETs are retried with exponential backoff on connection errors and 429/5xx
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=('GET',),
+                raise_on_status=False
+            )
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, body TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._db_lock = threading.Lock()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'revalidations': 0, 'stale_on_error': 0, 'errors': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _ttl(self, url):
+        path = urlsplit(url).path
+        for prefix, ttl in self.ttls:
+            if path.startswith(prefix):
+                return ttl
+        return self.default_ttl
+
+    def _read(self, key):
+        with self._db_lock:
+            row = self._db.execute("SELECT body, fetched_at FROM responses WHERE url = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, None)
+
+    def _write(self, key, data):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (url, body, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(data), time.time())
+            )
+            self._db.commit()
+
+    def _fetch(self, url, key):
+        """Fetch and store; None for non-200 responses, which are not cached"""
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        self._write(key, data)
+        return data
+
+    def get_json(self, url):
+        """Return the decoded JSON body for `url`, or None if it could not be fetched"""
+        key = normalize_url(url)
+        data, fetched_at = self._read(key)
+
+        if data is not None:
+            age = time.time() - fetched_at
+            ttl = self._ttl(url)
+            if age < ttl:
+                self._count('hits')
+                return data
+            if age < ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self._revalidate(url, key)
+                return data
+
+        self._count('misses')
+        try:
+            fresh = self._fetch(url, key)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Request to {url} failed: {e}")
+            fresh = None
+        if fresh is None and data is not None:
+            self._count('stale_on_error')
+            return data
+        if fresh is None:
+            self._count('errors')
+        return fresh
+
+    def _revalidate(self, url, key):
+        with self._stats_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self._stats['revalidations'] += 1
+
+        def refresh():
+            try:
+                self._fetch(url, key)
+            except (requests.RequestException, ValueError) as e:
+                logger.warning(f"Background refresh of {url} failed: {e}")
+            finally:
+                with self._stats_lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(refresh)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import threading
+import time
+import uuid
+
+
+class ResultStore:
+    """Bounded in-memory store of recommendation requests and their results.
+
+    Each request id starts out pending and becomes done when the recommender
+    replies. At most `max_entries` requests are kept: the oldest are evicted
+    first, and entries older than `ttl` seconds are forgotten. Replies for
+    ids that are unknown, expired or already answered are rejected.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # request_id -> (created_at, status, result)
+        self._stats = {'created': 0, 'completed': 0, 'evicted': 0, 'rejected': 0}
+
+    def create(self):
+        """Register a pending request and return its id"""
+        request_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            self._entries[request_id] = (time.monotonic(), 'pending', None)
+            self._stats['created'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+        return request_id
+
+    def complete(self, request_id, result):
+        """Store the result for a pending request; returns False if it cannot be matched"""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(request_id)
+            if entry is None or entry[1] != 'pending':
+                self._stats['rejected'] += 1
+                return False
+            self._entries[request_id] = (entry[0], 'done', result)
+            self._stats['completed'] += 1
+            return True
+
+    def discard(self, request_id):
+        with self._lock:
+            self._entries.pop(request_id, None)
+
+    def get(self, request_id):
+        """('done', result), ('pending', None) or ('unknown', None)"""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(request_id)
+        if entry is None:
+            return 'unknown', None
+        return entry[1], entry[2]
+
+    def _expire(self):
+        # Entries are in creation order, so expired ones are always at the front
+        cutoff = time.monotonic() - self.ttl
+        while self._entries:
+            request_id, (created_at, _, _) = next(iter(self._entries.items()))
+            if created_at >= cutoff:
+                break
+            del self._entries[request_id]
+            self._stats['evicted'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['pending'] = sum(1 for _, status, _ in self._entries.values() if status == 'pending')
+        stats['capacity'] = self.max_entries
+        return stats
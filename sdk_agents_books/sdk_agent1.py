@@ -2,14 +2,19 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from fetchai.crypto import Identity
 from fetchai.registration import register_with_agentverse
-from fetchai.communication import parse_message_from_agent
+from fetchai.communication import parse_message_from_agent, send_message_to_agent
 import logging
 import os
 from dotenv import load_dotenv
-import requests
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from http_cache import CachedHttpClient
+from book_index import BookIndex
+from similarity import ExactSimilarity
+from concurrent.futures import ThreadPoolExecutor, wait
+from candidates import FeatureCache, unique_candidates, title_key, tfidf
+from scipy.sparse import vstack
 import json
+import numpy as np
+import threading
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s\n')
@@ -20,20 +25,50 @@ CORS(app)
 # Initialising client identity
 client_identity = None
 
+# Largest `book_names` batch accepted in one message
+MAX_BATCH_BOOKS = int(os.getenv("MAX_BATCH_BOOKS", "50"))
+
 class BookRecommender:
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(stop_words='english')
+        # Each OpenLibrary work is tokenised once and reused across requests
+        self.features = FeatureCache(max_entries=int(os.getenv("FEATURE_CACHE_MAX_ENTRIES", "50000")))
+        # Searches change slowly and works records even more so; stale
+        # entries are served while a fresh copy is fetched in the background
+        self.http = CachedHttpClient(
+            os.getenv("OPENLIBRARY_CACHE_PATH", "openlibrary_cache.sqlite3"),
+            ttls={
+                '/search.json': int(os.getenv("OPENLIBRARY_SEARCH_TTL", str(24 * 3600))),
+                '/works/': int(os.getenv("OPENLIBRARY_WORKS_TTL", str(7 * 24 * 3600)))
+            },
+            default_ttl=24 * 3600,
+            stale_ttl=int(os.getenv("OPENLIBRARY_STALE_TTL", str(7 * 24 * 3600))),
+            pool_size=int(os.getenv("OPENLIBRARY_MAX_CONCURRENCY", "8"))
+        )
+        # Subject searches run in parallel, bounded by the connection pool size
+        self.fanout = ThreadPoolExecutor(
+            max_workers=int(os.getenv("OPENLIBRARY_MAX_CONCURRENCY", "8")),
+            thread_name_prefix="openlibrary"
+        )
+        self.fanout_deadline = float(os.getenv("OPENLIBRARY_FANOUT_DEADLINE", "8"))
+        # Prebuilt offline index (see book_index.py); without one, fall back to live subject searches
+        index_dir = os.getenv("BOOK_INDEX_DIR", ".book_index")
+        self.index = BookIndex(
+            index_dir,
+            backend=os.getenv("BOOK_SIMILARITY_BACKEND", "exact"),
+            nprobe=int(os.getenv("BOOK_IVF_NPROBE", "8")),
+            # 0 re-scores every probed candidate exactly
+            shortlist=int(os.getenv("BOOK_IVF_SHORTLIST", "0")) or None
+        ) if os.path.exists(os.path.join(index_dir, 'meta.json')) else None
         
     def get_book_details(self, book_name):
         """Fetch detailed book information from OpenLibrary API"""
         # Search for the book
         search_url = f"http://openlibrary.org/search.json?title={book_name}&fields=key,title,author_name,subject,first_publish_year,isbn,edition_key&limit=10"
-        response = requests.get(search_url)
-        if response.status_code != 200:
+        search_data = self.http.get_json(search_url)
+        if search_data is None:
             logger.info("Book not found in open library api")
             return None
             
-        search_data = response.json()
         if not search_data.get('docs'):
             logger.info("Relevant info not found in open library api")
             return None
@@ -44,33 +79,62 @@ class BookRecommender:
         # Get additional book details including description
         if book.get('key'):
             works_url = f"https://openlibrary.org{book['key']}.json"
-            works_response = requests.get(works_url)
-            if works_response.status_code == 200:
-                works_data = works_response.json()
+            works_data = self.http.get_json(works_url)
+            if works_data is not None:
                 book['description'] = works_data.get('description', '')
         # logger.info(book)
         return book
 
-    def create_book_feature_vector(self, book):
-        """Create a feature vector from book metadata"""
-        features = []
-        
-        subjects = book.get('subject', [])
-        features.extend(subjects)
-    
-        authors = book.get('author_name', [])
-        features.extend(authors)
-        
-        if isinstance(book.get('description'), dict):
-            features.append(book['description'].get('value', ''))
-        elif isinstance(book.get('description'), str):
-            features.append(book['description'])
-            
-        return ' '.join(str(f) for f in features) #concatinating all features into a single string
+    def search_subjects(self, subjects):
+        """Query each subject concurrently and return the books found in subject order.
+
+        The whole fan-out is bounded by `fanout_deadline`; subjects that have
+        not answered by then are dropped rather than delaying the response.
+        """
+        futures = []
+        # Query each subject individually to get more diverse results
+        for subject in subjects:
+            logger.info(f'Querying subject: {subject}')
+            search_url = f"http://openlibrary.org/search.json?subject={subject}&fields=key,title,author_name,subject,first_publish_year,description&limit=10"
+            futures.append(self.fanout.submit(self.http.get_json, search_url))
+
+        done, not_done = wait(futures, timeout=self.fanout_deadline)
+        if not_done:
+            logger.info(f"Dropped {len(not_done)} of {len(futures)} subject searches that missed the deadline")
+            for future in not_done:
+                future.cancel()
+
+        similar_books = []
+        for future in futures:
+            if future in done and future.exception() is None and future.result() is not None:
+                similar_books.extend(future.result().get('docs', []))
+        return similar_books
+
+    def get_indexed_similar_books(self, book_name, k=5):
+        """Top-k recommendations from the prebuilt index: a lookup plus one sparse dot product"""
+        seed_titles = [book_name]
+        row = self.index.find_row(book_name)
+        if row is not None:
+            query_vector = self.index.matrix[row]
+        else:
+            # Unknown to the index; describe it from OpenLibrary and project it onto the fitted vocabulary
+            main_book = self.get_book_details(book_name)
+            if not main_book:
+                logger.error(f"Could not find book: {book_name}")
+                return []
+            query_vector = self.index.vectorize(main_book)
+            seed_titles.append(main_book.get('title'))
+            row = self.index.find_row(main_book.get('title'))
+        exclude_rows = () if row is None else (row,)
+        # Like the live path: other editions of the book and repeated titles are left out
+        return self.index.recommend(query_vector, k=k, seed_titles=seed_titles, exclude_rows=exclude_rows)
 
     def get_similar_books(self, book_name):
         """Get book recommendations using similarity matching"""
         try:
+            if self.index is not None:
+                return self.get_indexed_similar_books(book_name)
+
             # Get main book details
             main_book: dict = self.get_book_details(book_name)
             if not main_book:
@@ -79,63 +143,88 @@ class BookRecommender:
                 
             # Get the subjects and make multiple queries to ensure we get enough books
             subjects = main_book.get('subject', ['fiction'])[:23]  # Take fewer subjects to avoid over-specificity
-            similar_books = []
-            
-            # Query each subject individually to get more diverse results
-            for subject in subjects:
-                logger.info(f'Querying subject: {subject}')
-                # Use OR operator (|) instead of AND (,) for broader results
-                search_url = f"http://openlibrary.org/search.json?subject={subject}&fields=key,title,author_name,subject,first_publish_year,description&limit=10"
-                similar_response = requests.get(search_url)
-                
-                if similar_response.status_code == 200:
-                    books = similar_response.json().get('docs', [])
-                    similar_books.extend(books)
-            
-            # Remove duplicates based on title
-            seen_titles = set()
-            unique_similar_books = []
-            for book in similar_books:
-                if book.get('title') not in seen_titles:
-                    seen_titles.add(book.get('title'))
-                    unique_similar_books.append(book)
-
-            logger.info(f"similar_books: {unique_similar_books}")
-            # Create feature vectors for similarity comparison
-            books_features = [self.create_book_feature_vector(main_book)]
-            books_features.extend([self.create_book_feature_vector(book) for book in unique_similar_books])
+            similar_books = self.search_subjects(subjects)
             
+            candidates, counts = unique_candidates(similar_books, self.features)
+            del similar_books
+            if not candidates:
+                return []
+            logger.info(f"Ranking {len(candidates)} candidates for: {book_name}")
+
+            # Create feature vectors for similarity comparison; IDF is taken over this request's pool
+            tfidf_matrix = tfidf(vstack([self.features.vectorize([main_book]), counts], format='csr'))
+
             # Calculate similarity scores
-            tfidf_matrix = self.vectorizer.fit_transform(books_features)
-            cosine_similarities = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:]).flatten()
-            
-            # Sort books by similarity
-            unique_similar_books_with_scores = list(zip(unique_similar_books, cosine_similarities))
-            unique_similar_books_with_scores.sort(key=lambda x: x[1], reverse=True)
+            ranked = ExactSimilarity(tfidf_matrix[1:]).search(tfidf_matrix[0:1], k=5)
 
-            
             # Format recommendations
-            recommendations = []
-            for book, score in unique_similar_books_with_scores[:5]:
-                logger.info(f"this runs {book}, {score}")
-                if book.get('title') != main_book.get('title'):
-                    
-                    recommendation = {
-                        'title': book.get('title'),
-                        'author': book.get('author_name', ['Unknown'])[0],
-                        'first_publish_year': book.get('first_publish_year', 'Unknown'),
-                        'subject': book.get('subject', [])[:3],
-                        'similarity_score': round(float(score), 3)
-                    }
-                    recommendations.append(recommendation)
-            return recommendations
-            
+            main_title = title_key(main_book.get('title'))
+            return [
+                candidates[row].recommendation(score)
+                for row, score in ranked
+                if title_key(candidates[row].title) != main_title
+            ]
+
         except Exception as e:
             logger.error(f"Error getting similar books: {str(e)}")
             return []
 
+    def get_similar_books_batch(self, book_names, k=5):
+        """Recommendations for many titles at once, keyed by the requested title.
+
+        Titles are resolved concurrently, their subjects are merged so each
+        subject is searched once for the whole batch, and every seed is scored
+        against the shared candidate pool in a single matrix product.
+        """
+        try:
+            if self.index is not None:
+                return {name: self.get_indexed_similar_books(name, k=k) for name in book_names}
+
+            seeds = dict(zip(book_names, self.fanout.map(self.get_book_details, book_names)))
+            found = [(name, book) for name, book in seeds.items() if book]
+            for name in seeds.keys() - {name for name, _ in found}:
+                logger.error(f"Could not find book: {name}")
+            if not found:
+                return {name: [] for name in book_names}
+
+            # dict.fromkeys keeps first-seen order so the pool stays deterministic
+            subjects = list(dict.fromkeys(
+                subject for _, book in found for subject in book.get('subject', ['fiction'])[:23]
+            ))
+            logger.info(f"Searching {len(subjects)} distinct subjects for {len(found)} books")
+
+            pool, counts = unique_candidates(self.search_subjects(subjects), self.features)
+            if not pool:
+                return {name: [] for name in book_names}
+
+            tfidf_matrix = tfidf(vstack([self.features.vectorize([book for _, book in found]), counts], format='csr'))
+            # Rows are L2-normalised, so one sparse product gives every seed's cosine scores
+            scores = (tfidf_matrix[:len(found)] @ tfidf_matrix[len(found):].T).toarray()
+
+            results = {name: [] for name in book_names}
+            for (name, main_book), seed_scores in zip(found, scores):
+                main_title = title_key(main_book.get('title'))
+                for i in np.argsort(-seed_scores, kind='stable')[:k + 1]:
+                    if title_key(pool[i].title) == main_title or len(results[name]) == k:
+                        continue
+                    results[name].append(pool[i].recommendation(seed_scores[i]))
+            return results
+
+        except Exception as e:
+            logger.error(f"Error getting similar books for batch: {str(e)}")
+            return {name: [] for name in book_names}
+
 recommender = BookRecommender()
 
+# Recommendation jobs run here so the webhook can acknowledge at once; the
+# semaphore bounds queued plus running jobs and turns overload into HTTP 429
+MAX_PENDING_REQUESTS = int(os.getenv("MAX_PENDING_REQUESTS", "100"))
+request_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RECOMMENDATION_WORKERS", "4")),
+    thread_name_prefix="recommend"
+)
+request_slots = threading.BoundedSemaphore(MAX_PENDING_REQUESTS)
+
 def init_client():
     """Initialize and register the client agent."""
     global client_identity
@@ -152,12 +241,16 @@ def init_client():
                 <use_case>To receive book names and provide recommendations.</use_case>
             </use_cases>
             <payload_requirements>
-            <description>This agent requires a book name in text format.</description>
+            <description>This agent requires a book name in text format, or a list of book names.</description>
             <payload>
                 <requirement>
                     <parameter>book_name</parameter>
                     <description>The name of the book to get recommendations for.</description>
                 </requirement>
+                <requirement>
+                    <parameter>book_names</parameter>
+                    <description>Optional list of book names to get recommendations for in one request.</description>
+                </requirement>
             </payload>
             </payload_requirements>
         """
@@ -175,6 +268,28 @@ def init_client():
         logger.error(f"Initialization error: {e}")
         raise
 
+def send_recommendations(sender, request_id, book_name=None, book_names=None):
+    """Worker job: compute recommendations and send them back to the requesting agent"""
+    try:
+        if book_names:
+            recommendations = recommender.get_similar_books_batch(book_names)
+            logger.info(f"Generated recommendations for {len(recommendations)} books")
+        else:
+            recommendations = recommender.get_similar_books(book_name)
+            logger.info(f"Generated recommendations for: {book_name}")
+        send_message_to_agent(
+            client_identity,
+            sender,
+            {
+                'request_id': request_id,
+                'recommendations': recommendations
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error sending recommendations for request {request_id}: {e}")
+    finally:
+        request_slots.release()
+
 @app.route('/api/webhook', methods=['POST'])
 def webhook():
     """Handle incoming book requests"""
@@ -183,24 +298,46 @@ def webhook():
         logger.info("Received book request")
 
         message = parse_message_from_agent(data)
+        request_id = message.payload.get('request_id')
+        book_names = message.payload.get('book_names')
         book_name = message.payload.get('book_name')
-        logger.info(f"book is : {book_name}")
-        if not book_name:
-            return jsonify({"error": "No book name provided"}), 400
+        if book_names:
+            if not isinstance(book_names, list) or len(book_names) > MAX_BATCH_BOOKS \
+                    or not all(isinstance(name, str) and name.strip() for name in book_names):
+                return jsonify({"error": f"book_names must be a list of at most {MAX_BATCH_BOOKS} non-empty titles"}), 400
+            book_names = list(dict.fromkeys(book_names))
+        else:
+            logger.info(f"book is : {book_name}")
+            if not book_name:
+                return jsonify({"error": "No book name provided"}), 400
+
+        # Acknowledge now; a worker runs the OpenLibrary fan-out and replies to the sender later
+        if not request_slots.acquire(blocking=False):
+            logger.warning(f"Rejecting book request {request_id}: {MAX_PENDING_REQUESTS} requests pending")
+            return jsonify({"error": f"Too many pending requests ({MAX_PENDING_REQUESTS})"}), 429
+        try:
+            request_pool.submit(send_recommendations, message.sender, request_id, book_name, book_names)
+        except Exception:
+            request_slots.release()
+            raise
 
-        recommendations = recommender.get_similar_books(book_name)
-        logger.info(f"Generated recommendations for: {book_name}")
-        logger.info(f"Book recommendations: {recommendations}")
-        
         return jsonify({
-            "status": "success",
-            "recommendations": recommendations
-        })
+            "status": "accepted",
+            "request_id": request_id
+        }), 202
 
     except Exception as e:
         logger.error(f"Error in webhook: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Expose OpenLibrary response and feature cache counters"""
+    return jsonify({
+        "openlibrary_cache": recommender.http.stats(),
+        "feature_cache": recommender.features.stats()
+    })
+
 if __name__ == "__main__":
     load_dotenv()
     init_client()
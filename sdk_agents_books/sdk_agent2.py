@@ -2,7 +2,8 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from fetchai.crypto import Identity
 from fetchai.registration import register_with_agentverse
-from fetchai.communication import send_message_to_agent
+from fetchai.communication import send_message_to_agent, parse_message_from_agent
+from result_store import ResultStore
 import logging
 import os
 from dotenv import load_dotenv
@@ -15,6 +16,15 @@ CORS(app)
 # Initialising client identity
 client_identity = None
 
+# Recommendations arrive later at /api/webhook and wait here to be polled
+result_store = ResultStore(
+    max_entries=int(os.getenv("RESULT_STORE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("RESULT_STORE_TTL", "3600"))
+)
+
+# Largest `book_names` batch the recommendation agent accepts in one message
+MAX_BATCH_BOOKS = int(os.getenv("MAX_BATCH_BOOKS", "50"))
+
 def init_client():
     """Initialize and register the client agent."""
     global client_identity
@@ -26,7 +36,7 @@ def init_client():
             ![domain:innovation-lab](https://img.shields.io/badge/innovation--lab-3D8BD3)
             domain:book-requests
 
-            <description>This Agent sends book names to the recommendation agent.</description>
+            <description>This Agent sends book names to the recommendation agent and stores the recommendations it sends back.</description>
             <use_cases>
                 <use_case>To send book names and receive recommendations.</use_case>
             </use_cases>
@@ -37,6 +47,10 @@ def init_client():
                     <parameter>book_name</parameter>
                     <description>The name of the book to get recommendations for.</description>
                 </requirement>
+                <requirement>
+                    <parameter>book_names</parameter>
+                    <description>Optional list of book names to get recommendations for in one request.</description>
+                </requirement>
             </payload>
             </payload_requirements>
         """
@@ -61,32 +75,83 @@ def request_recommendations():
     try:
         data = request.get_json()
         book_name = data.get('payload').get('book_name')
+        book_names = data.get('payload').get('book_names')
         agent_address = data.get('agent_address')
 
-        if not book_name or not agent_address:
+        if not (book_name or book_names) or not agent_address:
             return jsonify({"error": "Missing book name or agent address"}), 400
 
-        logger.info(f"Requesting recommendations for book: {book_name}")
-
-        payload = {
-            'book_name': book_name
-        }
-
-        send_message_to_agent(
-            client_identity,
-            agent_address,
-            payload
-        )
+        if book_names:
+            if not isinstance(book_names, list) or len(book_names) > MAX_BATCH_BOOKS \
+                    or not all(isinstance(name, str) and name.strip() for name in book_names):
+                return jsonify({"error": f"book_names must be a list of at most {MAX_BATCH_BOOKS} non-empty titles"}), 400
+            logger.info(f"Requesting recommendations for {len(book_names)} books")
+            payload = {
+                'book_names': book_names
+            }
+        else:
+            logger.info(f"Requesting recommendations for book: {book_name}")
+            payload = {
+                'book_name': book_name
+            }
+
+        request_id = result_store.create()
+        payload['request_id'] = request_id
+        try:
+            send_message_to_agent(
+                client_identity,
+                agent_address,
+                payload
+            )
+        except Exception:
+            result_store.discard(request_id)
+            raise
 
         return jsonify({
             "status": "request_sent",
-            "book_name": book_name
-        })
+            **({"book_names": book_names} if book_names else {"book_name": book_name}),
+            "request_id": request_id
+        }), 202
 
     except Exception as e:
         logger.error("Error requesting recommendations", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/webhook', methods=['POST'])
+def webhook():
+    """Store recommendations sent back by the recommendation agent"""
+    try:
+        data = request.get_data().decode("utf-8")
+        logger.info("Received recommendations")
+
+        message = parse_message_from_agent(data)
+        request_id = message.payload.get('request_id')
+        if result_store.complete(request_id, message.payload.get('recommendations', [])):
+            logger.info(f"Stored recommendations for request_id: {request_id}")
+        else:
+            logger.info(f"Dropping recommendations for unknown or expired request_id: {request_id}")
+
+        return jsonify({"status": "success"})
+
+    except Exception as e:
+        logger.error(f"Error in webhook: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/recommendations/<request_id>', methods=['GET'])
+def get_recommendations(request_id):
+    """Poll for the recommendations of an earlier request"""
+    status, recommendations = result_store.get(request_id)
+    if status == 'done':
+        return jsonify({"status": "success", "request_id": request_id, "recommendations": recommendations})
+    if status == 'pending':
+        return jsonify({"status": "pending", "request_id": request_id}), 202
+    return jsonify({"status": "error", "message": "Unknown or expired request_id"}), 404
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Expose result store statistics"""
+    return jsonify({"results": result_store.stats()})
+
 if __name__ == "__main__":
     load_dotenv()
     init_client()
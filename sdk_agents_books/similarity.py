@@ -0,0 +1,178 @@
+from scipy.sparse import vstack
+import json
+import logging
+import numpy as np
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def _project(vectors, components):
+    """Reduced, L2-normalised dense rows for sparse TF-IDF rows"""
+    reduced = np.asarray(vectors @ components.T, dtype=np.float32)
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores, ids, k):
+    """(id, score) pairs for the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+class ExactSimilarity:
+    """Brute-force cosine search over L2-normalised sparse rows.
+
+    Rows are scored `block_size` at a time so the dense score buffer stays
+    bounded however large the catalog is; each block keeps only its own top k
+    before the blocks are merged.
+    """
+
+    name = 'exact'
+
+    def __init__(self, matrix=None, block_size=262144):
+        self.matrix = matrix
+        self.block_size = block_size
+
+    def __len__(self):
+        return 0 if self.matrix is None else self.matrix.shape[0]
+
+    def add(self, vectors):
+        """Append rows; their ids continue from the current size"""
+        self.matrix = vectors.tocsr() if self.matrix is None else vstack([self.matrix, vectors], format='csr')
+
+    def search(self, query_vector, k=5, exclude_rows=()):
+        """Rows and cosine scores of the k rows most similar to `query_vector`"""
+        exclude_rows = set(exclude_rows)
+        query = query_vector.T.tocsc()
+        candidates = []
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            scores = (self.matrix[start:stop] @ query).toarray().ravel()
+            for row in exclude_rows:
+                if start <= row < stop:
+                    scores[row - start] = -np.inf
+            candidates.extend(_top_k(scores, np.arange(start, stop), k + len(exclude_rows)))
+        candidates.sort(key=lambda item: item[1], reverse=True)
+        return [(row, score) for row, score in candidates if row not in exclude_rows][:k]
+
+
+class IVFSimilarity:
+    """Approximate cosine search with an inverted-file index over reduced vectors.
+
+    Sparse TF-IDF rows are projected to `dims` dense dimensions (truncated SVD)
+    and re-normalised, then clustered into `nlist` lists with k-means. A query
+    only scores the rows in its `nprobe` closest lists, so raising `nprobe`
+    buys recall with latency. New rows are projected and appended to their
+    nearest list without retraining.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, components, centroids, vectors, assignments, nprobe=8, matrix=None, shortlist=None):
+        self.components = np.asarray(components, dtype=np.float32)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.vectors = vectors
+        self.nprobe = nprobe
+        self.matrix = matrix
+        self.shortlist = shortlist
+        self._added = []
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.cumsum(np.bincount(assignments, minlength=len(self.centroids)))[:-1]
+        self.lists = np.split(order, bounds)
+
+    def __len__(self):
+        return len(self.vectors) + len(self._added)
+
+    def add(self, vectors):
+        """Project and insert rows into their nearest lists; ids continue from the current size"""
+        if self.matrix is not None:
+            self.matrix = vstack([self.matrix, vectors], format='csr')
+        reduced = _project(vectors, self.components)
+        nearest = np.argmax(reduced @ self.centroids.T, axis=1)
+        for vector, c in zip(reduced, nearest):
+            self.lists[c] = np.append(self.lists[c], len(self))
+            self._added.append(vector)
+
+    def _rows(self, ids):
+        base = len(self.vectors)
+        stored = ids < base
+        out = np.empty((len(ids), self.components.shape[0]), dtype=np.float32)
+        out[stored] = self.vectors[ids[stored]]
+        for i in np.flatnonzero(~stored):
+            out[i] = self._added[ids[i] - base]
+        return out
+
+    def search(self, query_vector, k=5, exclude_rows=(), nprobe=None, shortlist=None):
+        """Approximate rows and cosine scores of the k rows most similar to `query_vector`"""
+        query = _project(query_vector, self.components)[0]
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        ids = np.concatenate([self.lists[c] for c in probes])
+        if exclude_rows:
+            ids = ids[~np.isin(ids, list(exclude_rows))]
+        if len(ids) == 0:
+            return []
+        # Sorted ids turn the gathers from memory-mapped rows into forward scans
+        ids = np.sort(ids)
+        if self.matrix is None:
+            return _top_k(self._rows(ids) @ query, ids, k)
+
+        shortlist = shortlist or self.shortlist
+        if shortlist and len(ids) > max(shortlist, k):
+            ids = np.sort(np.array([row for row, _ in _top_k(self._rows(ids) @ query, ids, max(shortlist, k))]))
+        return _top_k((self.matrix[ids] @ query_vector.T).toarray().ravel(), ids, k)
+
+    @classmethod
+    def build(cls, matrix, dims=128, nlist=None, nprobe=8, seed=0):
+        """Fit the projection and the coarse quantiser over `matrix`"""
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.cluster import MiniBatchKMeans
+
+        dims = min(dims, matrix.shape[1] - 1)
+        # Roughly sqrt(n) lists keeps both the centroid scan and each list short
+        nlist = nlist or max(1, int(np.sqrt(matrix.shape[0])))
+        svd = TruncatedSVD(n_components=dims, random_state=seed).fit(matrix)
+        vectors = _project(matrix, svd.components_.astype(np.float32))
+        kmeans = MiniBatchKMeans(n_clusters=nlist, random_state=seed, n_init=3).fit(vectors)
+        centroids = kmeans.cluster_centers_ / np.maximum(np.linalg.norm(kmeans.cluster_centers_, axis=1, keepdims=True), 1e-12)
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        return cls(svd.components_, centroids, vectors, assignments, nprobe=nprobe, matrix=matrix)
+
+    def save(self, out_dir):
+        """Write the index (including rows added since build) next to a book index"""
+        os.makedirs(out_dir, exist_ok=True)
+        vectors = np.vstack([self.vectors, np.stack(self._added)]) if self._added else np.asarray(self.vectors)
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for c, ids in enumerate(self.lists):
+            assignments[ids] = c
+        np.save(os.path.join(out_dir, 'ivf_components.npy'), self.components)
+        np.save(os.path.join(out_dir, 'ivf_centroids.npy'), self.centroids)
+        np.save(os.path.join(out_dir, 'ivf_vectors.npy'), vectors)
+        np.save(os.path.join(out_dir, 'ivf_assignments.npy'), assignments)
+        with open(os.path.join(out_dir, 'ivf_meta.json'), 'w') as f:
+            json.dump({'rows': len(vectors), 'dims': self.components.shape[0], 'nlist': len(self.centroids)}, f)
+
+    @classmethod
+    def load(cls, index_dir, nprobe=8, matrix=None, shortlist=None):
+        """Load a saved index; the reduced vectors are memory-mapped.
+
+        Pass the book index's sparse `matrix` to re-score candidates exactly.
+        """
+        return cls(
+            np.load(os.path.join(index_dir, 'ivf_components.npy')),
+            np.load(os.path.join(index_dir, 'ivf_centroids.npy')),
+            np.load(os.path.join(index_dir, 'ivf_vectors.npy'), mmap_mode='r'),
+            np.load(os.path.join(index_dir, 'ivf_assignments.npy')),
+            nprobe=nprobe,
+            matrix=matrix,
+            shortlist=shortlist
+        )
+
+    @staticmethod
+    def exists(index_dir):
+        return os.path.exists(os.path.join(index_dir, 'ivf_meta.json'))
@@ -0,0 +1,45 @@
+import json
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from book_index import BookIndex, build_index
+
+
+def write_dump(path, books):
+    with open(path, 'w') as f:
+        for i, (title, subjects) in enumerate(books):
+            f.write(json.dumps({
+                'key': f"/works/W{i}",
+                'title': title,
+                'author_name': ['Author'],
+                'subject': subjects,
+                'first_publish_year': 1965
+            }) + '\n')
+
+
+def test_recommendations_skip_seed_editions_and_repeated_titles(tmp_path):
+    desert = ['desert planet', 'spice', 'empire', 'prophecy']
+    write_dump(tmp_path / 'dump.jsonl', [
+        ('Dune', desert),
+        ('Dune', desert),
+        ('dune ', desert),
+        ('Arrakis', desert),
+        ('Arrakis', desert),
+        ('Spice Wars', desert[:3]),
+        ('Sand Empire', desert[:2]),
+        ('Prophecy', desert[2:]),
+        ('Gardening', ['roses', 'soil']),
+    ])
+    build_index(str(tmp_path / 'dump.jsonl'), str(tmp_path / 'index'))
+    index = BookIndex(str(tmp_path / 'index'))
+
+    row = index.find_row('Dune')
+    books = index.recommend(index.matrix[row], k=3, seed_titles=['Dune'], exclude_rows=(row,))
+
+    titles = [book['title'] for book in books]
+    assert len(titles) == 3
+    assert 'Dune' not in titles and 'dune ' not in titles
+    assert len(set(titles)) == 3
+    assert titles[0] == 'Arrakis'